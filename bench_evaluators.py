@@ -0,0 +1,132 @@
+"""
+Differential correctness and throughput benchmark for the evaluator backends.
+
+Every backend scores the same hands: all 2,598,960 5 card hands with
+--exhaustive (a random sample otherwise) and a random sample of 7 card
+hands. Scores only have to order hands the same way the reference does, so
+a backend is checked by grouping its scores by reference rank:
+    bad ranks   reference ranks whose hands don't all get one score, or whose
+                scores overlap the next rank's
+    pair errors fraction of random hand pairs ordered differently (ties included)
+
+Speed is measured per backend as batch evaluations/sec, p50 / p99 latency
+of single get_score calls and peak traced memory (tracemalloc, so memory
+mapped lookup tables aren't counted). Memory is traced in a separate batch
+run, tracing every allocation would slow the timed one down.
+"""
+from itertools import combinations
+from time import perf_counter, perf_counter_ns
+import tracemalloc
+import numpy as np
+import argparse
+import json
+# local imports
+import cards
+import evaluator
+import utils
+
+
+BACKENDS = ['lookup', 'compute', 'treys', 'compute_v2', 'calc']
+REFERENCE = 'treys'
+NUM_SEVEN = 100000
+NUM_FIVE = 100000
+NUM_LATENCY = 10000
+NUM_PAIRS = 1000000
+SEED = 0
+
+
+def get_five_card_hands(num_hands, rng):
+    """All 5 card hands if num_hands is None, else a random sample."""
+    if num_hands is None:
+        return np.array(list(combinations(cards.DECK, 5)), dtype=np.int8)
+    return utils.deal_batch(rng, num_hands, 5)
+
+
+def check_ordering(scores, ref_ranks, rng, num_pairs=NUM_PAIRS):
+    """(bad ranks, pair error rate) of scores against reference ranks."""
+    scores = np.asarray(scores, dtype=float)
+    order = np.lexsort((scores, ref_ranks))
+    scores, ref_ranks = scores[order], ref_ranks[order]
+
+    ranks, starts = np.unique(ref_ranks, return_index=True)
+    lows = scores[starts]
+    highs = scores[np.append(starts[1:], len(scores)) - 1]
+    bad = (lows != highs) | np.isnan(lows) | np.isnan(highs)
+    bad[:-1] |= highs[:-1] >= lows[1:]
+    bad[1:] |= highs[:-1] >= lows[1:]
+
+    i, j = rng.integers(0, len(scores), (2, num_pairs))
+    errors = np.sign(scores[i] - scores[j]) != np.sign(ref_ranks[i].astype(np.int64) - ref_ranks[j])
+    return int(bad.sum()), float(errors.mean())
+
+
+def time_backend(backend, hands, num_latency=NUM_LATENCY):
+    """{evals/sec, p50 / p99 latency in us, peak traced bytes} for one backend on hands."""
+    start = perf_counter()
+    scores = backend.get_scores_batch(hands)
+    elapsed = perf_counter() - start
+
+    tracemalloc.start()
+    backend.get_scores_batch(hands)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = []
+    for hand in hands[:num_latency].tolist():
+        t = perf_counter_ns()
+        backend.get_score(hand)
+        latencies.append(perf_counter_ns() - t)
+
+    return scores, {'evals_per_sec': len(hands) / elapsed,
+                    'p50_us': float(np.percentile(latencies, 50)) / 1000,
+                    'p99_us': float(np.percentile(latencies, 99)) / 1000,
+                    'peak_mb': peak / 2 ** 20}
+
+
+def run(backend_names, reference, hand_sets, rng):
+    """{set name: {backend: stats}} with every backend checked against reference."""
+    results = {}
+    for set_name, hands in hand_sets.items():
+        print(f"\n{set_name}: {len(hands)} hands")
+        ref_ranks = evaluator.get_evaluator(reference).get_ranks_batch(hands)
+        results[set_name] = {}
+        for name in backend_names:
+            try:
+                backend = evaluator.get_evaluator(name)
+            except Exception as e:  # e.g. calc.scores can't be imported
+                print(f"{name:>12}: unavailable ({type(e).__name__}: {e})")
+                continue
+
+            scores, stats = time_backend(backend, hands)
+            stats['bad_ranks'], stats['pair_errors'] = check_ordering(scores, ref_ranks, rng)
+            stats['exact'] = backend.exact
+            results[set_name][name] = stats
+            print(f"{name:>12}: {stats['evals_per_sec']:>12,.0f} evals/s  p50 {stats['p50_us']:8.2f}us  "
+                  f"p99 {stats['p99_us']:8.2f}us  peak {stats['peak_mb']:8.1f}MB  "
+                  f"bad ranks {stats['bad_ranks']:5d}  pair errors {stats['pair_errors']:.4%}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check every evaluator backend against a reference and time it.")
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=sorted(evaluator.BACKENDS))
+    parser.add_argument('--reference', default=REFERENCE, choices=evaluator.EXACT_BACKENDS)
+    parser.add_argument('--exhaustive', action='store_true', help="all 5 card hands instead of a sample")
+    parser.add_argument('--five', type=int, default=NUM_FIVE, help="5 card sample size")
+    parser.add_argument('--seven', type=int, default=NUM_SEVEN, help="7 card sample size")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--out', default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    hand_sets = {'5 card': get_five_card_hands(None if args.exhaustive else args.five, rng),
+                 '7 card': utils.deal_batch(rng, args.seven, 7)}
+    results = run(args.backends, args.reference, hand_sets, rng)
+
+    if args.out:
+        with open(args.out, 'w') as jsonFile:
+            json.dump(results, jsonFile, indent=2)
+
+
+if __name__ == '__main__':
+    main()
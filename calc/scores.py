@@ -1,7 +1,25 @@
+"""
+calc's own 5 card hand scores (score_hand) and the tables built from them:
+every k card hand scored in colex order (generate_values) and a percentile
+index over those scores. Tables live under VALUES_DIR, are built by
+python -m calc.scores and are otherwise generated / memory mapped on first
+use, importing this module computes nothing.
+"""
 import numpy as np
-import pandas as pd
-import itertools
-from tqdm import tqdm
+from functools import lru_cache
+from itertools import combinations
+from math import comb
+import argparse
+import os
+
+
+VALUES_DIR = './hand_values'
+CHUNK_SIZE = 1 << 20  # hands per chunk file
+BATCH_SIZE = 1 << 14  # hands scored per batch
+NUM_CARDS = 52
+
+# BINOM[n, k] = n C k, combos are numbered in colex order: sum of BINOM[c_i, i + 1] over sorted cards
+BINOM = np.array([[comb(n, k) for k in range(8)] for n in range(NUM_CARDS + 1)], dtype=np.int64)
 
 def build_deck():
     numbers=list(range(2,15))
@@ -13,12 +31,6 @@ def build_deck():
             deck.append(card)
     return deck
 
-def comb(arr, n):
-    arr = np.asarray(arr)
-    t = np.dtype([('', arr.dtype)]*n)
-    result = np.fromiter(itertools.co(arr, n), t)
-    return result.view(arr.dtype).reshape(-1, n)
-
 def check_four_of_a_kind(hand,letters,numbers,rnum,rlet):
     for i in numbers:
             if numbers.count(i) == 4:
@@ -148,22 +160,172 @@ def score_hand(hand):
 
     return score
 
-def handvalues(co):
-    scores =[] # We iterate over all combinations scoring them
-    for i in tqdm(combinations):
-        scores += [{"hand": i, "value": score_hand(i)}]
+def get_combos(k, start=0, stop=None):
+    """(N, k) card indices (into build_deck()) of the combos with colex numbers start to stop."""
+    stop = comb(NUM_CARDS, k) if stop is None else stop
+    ranks = np.arange(start, stop, dtype=np.int64)
+    combos = np.empty((len(ranks), k), dtype=np.int8)
+    for i in range(k, 0, -1):
+        # largest card c with c C i <= the remaining rank
+        c = np.searchsorted(BINOM[:, i], ranks, side='right') - 1
+        combos[:, i - 1] = c
+        ranks -= BINOM[c, i]
+    return combos
+
+
+def iter_batches(k, start, stop, batch_size=BATCH_SIZE):
+    """Yield (first colex number, combos) batches covering start to stop."""
+    for first in range(start, stop, batch_size):
+        yield first, get_combos(k, first, min(first + batch_size, stop))
 
-    scores = sorted(scores, key = lambda k: k['value']) # We sort hands by score
+
+def score_batch(combos, deck=None):
+    """score_hand of every combo, the best 5 card subset for 6-7 cards."""
+    deck = deck or build_deck()
+    scores = np.empty(len(combos))
+    for n, hand in enumerate(combos.tolist()):
+        hand = [deck[c] for c in hand]
+        scores[n] = score_hand(hand) if len(hand) == 5 else max(score_hand(list(five)) for five in combinations(hand, 5))
     return scores
 
 
-deck = build_deck()  # We create our deck
-combi = combinations(deck, 7)  # We create an array containing all possible 5 cards combinations
-hand_values = handvalues(combi)
-x = [i.get("hand", "") for i in hand_values]  # making a list of hands
-y = [i.get("value", "") for i in hand_values]  # making a list of values
+def get_combo_ids(combos):
+    """Colex numbers of (N, k) card index combos, cards in any order."""
+    combos = np.sort(np.asarray(combos, dtype=np.int64), axis=1)
+    return sum(BINOM[combos[:, i], i + 1] for i in range(combos.shape[1]))
+
+
+@lru_cache(maxsize=None)
+def get_all_combos(n, k):
+    """Every k of n indices in colex order (n <= 52), shared read only."""
+    combos = get_combos(k, 0, comb(n, k)).astype(np.int64)
+    combos.flags.writeable = False
+    return combos
+
+
+def get_completions(subset, k=5):
+    """Colex numbers of every k card hand containing the cards of subset (card indices)."""
+    subset = np.asarray(subset, dtype=np.int64)
+    rest = np.setdiff1d(np.arange(NUM_CARDS), subset)
+    extra = rest[get_all_combos(len(rest), k - len(subset))]
+    return get_combo_ids(np.concatenate([np.broadcast_to(subset, (len(extra), len(subset))), extra], axis=1))
+
+
+def get_completion_values(subsets, k=5, path=VALUES_DIR):
+    """Scores of every completion of each subset, concatenated, gathered from load_values(k)."""
+    values = load_values(k, path)
+    return np.concatenate([values[np.sort(get_completions(subset, k))] for subset in subsets])
+
+
+def get_chunk_file(path, k, chunk):
+    return os.path.join(path, f"{k}_cards", f"chunk_{chunk:05d}.npy")
+
+
+def generate_values(k=5, path=VALUES_DIR, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE):
+    """
+    Score every k card combo in colex order into chunk files under path, one
+    chunk in memory at a time. Finished chunks are skipped, so an interrupted
+    run resumes from the last completed one. Returns the merged values.npy.
+    """
+    total = comb(NUM_CARDS, k)
+    num_chunks = -(-total // chunk_size)
+    os.makedirs(os.path.join(path, f"{k}_cards"), exist_ok=True)
+    deck = build_deck()
+
+    from tqdm import tqdm  # progress bars only matter for the slow build
+
+    for chunk in tqdm(range(num_chunks)):
+        file = get_chunk_file(path, k, chunk)
+        if os.path.exists(file):
+            continue
+
+        start, stop = chunk * chunk_size, min((chunk + 1) * chunk_size, total)
+        values = np.empty(stop - start)
+        for first, combos in iter_batches(k, start, stop, batch_size):
+            values[first - start:first - start + len(combos)] = score_batch(combos, deck)
+
+        # write then rename, a chunk file is either complete or missing
+        np.save(file + '.tmp.npy', values)
+        os.replace(file + '.tmp.npy', file)
+
+    return merge_values(k, path, chunk_size)
+
+
+def merge_values(k=5, path=VALUES_DIR, chunk_size=CHUNK_SIZE):
+    """Copy the chunks into one memory mapped {k}_cards.npy, chunk by chunk."""
+    file = os.path.join(path, f"{k}_cards.npy")
+    if os.path.exists(file):
+        return file
+
+    total = comb(NUM_CARDS, k)
+    out = np.lib.format.open_memmap(file + '.tmp.npy', 'w+', np.float64, (total,))
+    for chunk in range(-(-total // chunk_size)):
+        out[chunk * chunk_size:(chunk + 1) * chunk_size] = np.load(get_chunk_file(path, k, chunk), mmap_mode='r')
+    out.flush()
+    del out
+    os.replace(file + '.tmp.npy', file)
+    return file
+
+
+def load_values(k=5, path=VALUES_DIR):
+    """score_hand of every k card combo, indexed by colex number (memory mapped)."""
+    file = os.path.join(path, f"{k}_cards.npy")
+    if not os.path.exists(file):
+        generate_values(k, path)
+    return np.load(file, mmap_mode='r')
+
+
+def get_index_files(k=5, path=VALUES_DIR):
+    return os.path.join(path, f"{k}_cards_scores.npy"), os.path.join(path, f"{k}_cards_below.npy")
+
+
+def build_percentile_index(k=5, path=VALUES_DIR, chunk_size=CHUNK_SIZE):
+    """
+    Sorted distinct scores and, for each, how many k card hands score below it.
+    Built chunk by chunk, so memory only grows with the number of distinct scores.
+    """
+    values = load_values(k, path)
+    scores, counts = np.zeros(0), np.zeros(0, dtype=np.int64)
+    for start in range(0, len(values), chunk_size):
+        chunk_scores, chunk_counts = np.unique(values[start:start + chunk_size], return_counts=True)
+        scores, inverse = np.unique(np.concatenate([scores, chunk_scores]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([counts, chunk_counts]), minlength=len(scores)).astype(np.int64)
+
+    scores_file, below_file = get_index_files(k, path)
+    np.save(scores_file, scores)
+    np.save(below_file, np.cumsum(counts) - counts)
+
+
+_indexes = {}
+
+
+def get_percentile_index(k=5, path=VALUES_DIR):
+    """(distinct scores, hands below each, total hands), memory mapped on first use."""
+    if (k, path) not in _indexes:
+        scores_file, below_file = get_index_files(k, path)
+        if not os.path.exists(below_file):
+            build_percentile_index(k, path)
+        _indexes[k, path] = (np.load(scores_file, mmap_mode='r'), np.load(below_file, mmap_mode='r'), comb(NUM_CARDS, k))
+    return _indexes[k, path]
+
+
+def get_percentile(score, k=5, path=VALUES_DIR):
+    """Percent of k card hands scoring below score."""
+    scores, below, total = get_percentile_index(k, path)
+    i = int(np.searchsorted(scores, score))
+    return (int(below[i]) if i < len(scores) else total) / total * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every k card hand into chunked .npy files.")
+    parser.add_argument('--cards', type=int, default=5)
+    parser.add_argument('--path', default=VALUES_DIR)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    print(generate_values(args.cards, args.path, args.chunk_size))
+    build_percentile_index(args.cards, args.path, args.chunk_size)
 
-data = {'hands': x, 'value': y} # making a dictionary of hands and values
-df = pd.DataFrame(data) # making a pandas dataframe with hands and values
 
-df.to_csv('hand_values.csv')
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Long lived batch version of calc.poker's questions.
+
+Reads JSON lines, each one query or a list of them:
+    {"hole": ["H14", "S14"], "board": ["C10", "D9", "H2"], "players": 3, "pot": 100, "price": 10}
+and answers each line with one JSON line (an object or a list in the same
+order) holding the current / future percentiles, equity, EV and the call /
+fold recommendation of should_call. Bad queries get {"error": ...}.
+
+python -m calc.service             stdin -> stdout
+python -m calc.service --port N    the same protocol on 127.0.0.1:N
+
+The value tables, percentile index and hand value caches are loaded once
+and stay warm between requests.
+"""
+from time import perf_counter
+import socketserver
+import argparse
+import json
+import sys
+# local imports
+from calc import poker, scores
+
+
+PORT = 8765
+
+
+def answer(query):
+    hole, board = list(query['hole']), list(query.get('board', []))
+    if len(hole) != 2 or not 3 <= len(board) <= 5:
+        raise ValueError("need 2 hole cards and a 3-5 card board")
+    unknown = [c for c in hole + board if c not in poker.DECK]
+    if unknown or len(set(hole + board)) != len(hole + board):
+        raise ValueError(f"bad or repeated cards: {unknown or hole + board}")
+
+    current, future = poker.get_percentiles(hole + board)
+    percentile = max(current, future)  # what calc.poker bets on
+    decision = poker.get_call_decision(float(query['players']), percentile, float(query['pot']), float(query['price']))
+    return {'hole': hole, 'board': board, 'current': current, 'future': future, 'percentile': percentile,
+            **decision, 'action': 'call' if decision['call'] else 'fold'}
+
+
+def handle_line(line):
+    """One JSON line in, one JSON line out."""
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return json.dumps({'error': f"bad JSON: {e}"})
+
+    def safe_answer(query):
+        try:
+            return answer(query)
+        except (KeyError, TypeError, ValueError) as e:
+            return {'error': f"{type(e).__name__}: {e}"}
+
+    if isinstance(request, list):
+        return json.dumps([safe_answer(query) for query in request])
+    return json.dumps(safe_answer(request))
+
+
+def warm_up():
+    """Load the tables and fill the completion caches before serving."""
+    start = perf_counter()
+    scores.get_percentile_index()
+    scores.load_values()
+    answer({'hole': ['H14', 'S14'], 'board': ['C10', 'D9', 'H2'], 'players': 1, 'pot': 1, 'price': 0})
+    print(f"Warm in {perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+class Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            if line.strip():
+                self.wfile.write((handle_line(line) + '\n').encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer calc.poker queries as JSON lines.")
+    parser.add_argument('--port', type=int, default=None, help=f"serve on 127.0.0.1 instead of stdin, e.g. {PORT}")
+    args = parser.parse_args()
+
+    warm_up()
+    if args.port:
+        with socketserver.TCPServer(('127.0.0.1', args.port), Handler) as server:
+            print(f"Serving on 127.0.0.1:{args.port}", file=sys.stderr)
+            server.serve_forever()
+    else:
+        for line in sys.stdin:
+            if line.strip():
+                print(handle_line(line), flush=True)
+
+
+if __name__ == '__main__':
+    main()
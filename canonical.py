@@ -0,0 +1,205 @@
+"""
+Suit isomorphism classes for (hole cards, board) situations.
+
+Relabelling suits never changes who wins, so any situation can be mapped to
+the canonical member of its class: the suit permutation giving the smallest
+(hole mask, board mask) pair. The class id packs that pair into one int
+(hole mask in the low 52 bits, board mask above it), e.g. there are 1755
+classes of flops with no hole cards.
+
+ClassCache / cached_by_class persist results per class id so expensive
+equity functions only run once per class; LRUCache is the bounded in memory
+version for hot decision loops.
+"""
+from collections import OrderedDict
+from functools import wraps
+from itertools import combinations
+import numpy as np
+import fcntl
+import json
+import multiprocessing.util
+import os
+# local imports
+import cards
+
+
+CACHE_DIR = './class_cache'
+FLUSH_EVERY = 1000  # new results between writes of a cache file
+
+# PERM_BITS[p][c]: mask bit of card c after suit permutation p
+PERM_BITS = [[cards.CARD_BIT[c] for c in cards.permute_suits(cards.DECK, perm)] for perm in cards.SUIT_PERMS]
+# numpy versions for canonicalize_batch, PERM_CARDS[p][c]: card c after suit permutation p
+PERM_BIT_ARRAY = np.array(PERM_BITS, dtype=np.uint64)
+PERM_CARDS = np.array([cards.permute_suits(cards.DECK, perm) for perm in cards.SUIT_PERMS], dtype=np.int8)
+
+
+def canonicalize(hand, board=()):
+    """(class id, perm) where perm maps the real suits onto the canonical ones."""
+    best_id, best_perm = None, None
+    for perm, bits in zip(cards.SUIT_PERMS, PERM_BITS):
+        hand_mask = 0
+        for c in hand:
+            hand_mask |= bits[c]
+        board_mask = 0
+        for c in board:
+            board_mask |= bits[c]
+
+        class_id = hand_mask | (board_mask << cards.NUM_CARDS)
+        if best_id is None or class_id < best_id:
+            best_id, best_perm = class_id, perm
+
+    return best_id, best_perm
+
+
+def canonicalize_batch(hands, boards):
+    """
+    Vectorized canonicalize for (N, h) hands and (N, b) boards: the canonical
+    (hands, boards) with cards sorted, i.e. get_class_cards of each class id.
+    """
+    hands = np.asarray(hands, dtype=np.intp)
+    boards = np.asarray(boards, dtype=np.intp)
+    best_board = np.full(len(hands), np.iinfo(np.uint64).max, dtype=np.uint64)
+    best_hand = best_board.copy()
+    best_perm = np.zeros(len(hands), dtype=np.intp)
+    for p, bits in enumerate(PERM_BIT_ARRAY):
+        # cards are distinct, so summing their bits is or-ing them
+        board_mask = bits[boards].sum(1, dtype=np.uint64)
+        hand_mask = bits[hands].sum(1, dtype=np.uint64)
+        better = (board_mask < best_board) | ((board_mask == best_board) & (hand_mask < best_hand))
+        best_board[better], best_hand[better], best_perm[better] = board_mask[better], hand_mask[better], p
+
+    perms = PERM_CARDS[best_perm]
+    return (np.sort(np.take_along_axis(perms, hands, 1), axis=1),
+            np.sort(np.take_along_axis(perms, boards, 1), axis=1))
+
+
+def get_class_cards(class_id):
+    """Canonical (hand, board) of a class id."""
+    hand_mask = class_id & ((1 << cards.NUM_CARDS) - 1)
+    return cards.mask_cards(hand_mask), cards.mask_cards(class_id >> cards.NUM_CARDS)
+
+
+def invert_perm(perm):
+    inverse = [0] * 4
+    for suit, new_suit in enumerate(perm):
+        inverse[new_suit] = suit
+    return tuple(inverse)
+
+
+def get_flop_classes():
+    return sorted({canonicalize((), flop)[0] for flop in combinations(cards.DECK, 3)})
+
+
+class ClassCache:
+    """
+    Persistent {class id: result} store, one JSON file per cached function.
+    The file is read on first use and new results are written every
+    flush_every misses and at exit.
+    """
+
+    def __init__(self, name, path=CACHE_DIR, flush_every=FLUSH_EVERY):
+        self.file = os.path.join(path, f"{name}.json")
+        self.flush_every = flush_every
+        self._data = None
+        self.unsaved = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = {}
+            if os.path.exists(self.file):
+                with open(self.file, "r") as jsonFile:
+                    self._data = json.load(jsonFile)
+            # unlike atexit, also runs when a pool worker shuts down
+            multiprocessing.util.Finalize(self, self.flush, exitpriority=0)
+        return self._data
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key):
+        return self.data[key]
+
+    def set(self, key, val):
+        self.data[key] = val
+        self.unsaved += 1
+        if self.unsaved >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """
+        Merge our results into the file. Pool workers each hold their own copy,
+        so the file is re-read under a lock and written whole via os.replace.
+        """
+        if not self.unsaved:
+            return
+        os.makedirs(os.path.dirname(self.file), exist_ok=True)
+        with open(self.file + ".lock", "w") as lockFile:
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+            if os.path.exists(self.file):
+                with open(self.file, "r") as jsonFile:
+                    self._data = {**json.load(jsonFile), **self._data}
+            tmp = f"{self.file}.{os.getpid()}.tmp"
+            with open(tmp, "w") as jsonFile:
+                json.dump(self._data, jsonFile)
+            os.replace(tmp, self.file)
+        self.unsaved = 0
+
+
+def cached_by_class(name=None, path=CACHE_DIR):
+    """
+    Decorator for fn(hand, board, *args) whose result is the same for every
+    suit relabelling of (hand, board). Results must be JSON serializable.
+    """
+    def decorator(fn):
+        cache = ClassCache(name or fn.__name__, path)
+
+        @wraps(fn)
+        def wrapper(hand, board=(), *args):
+            class_id, _ = canonicalize(hand, board)
+            key = ':'.join([str(class_id)] + [str(x) for x in args])
+            if key in cache:
+                cache.hits += 1
+                return cache.get(key)
+
+            cache.misses += 1
+            val = fn(hand, board, *args)
+            cache.set(key, val)
+            return val
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+class LRUCache:
+    """Bounded in memory cache, evicting the least recently used entry."""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key in self.data:
+            self.hits += 1
+            self.data.move_to_end(key)
+            return self.data[key]
+
+        self.misses += 1
+        return default
+
+    def set(self, key, val):
+        self.data[key] = val
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.data),
+                'hit_rate': self.hits / lookups if lookups else 0.0}
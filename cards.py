@@ -0,0 +1,105 @@
+"""
+Integer card encoding shared by the evaluators, simulations and the table.
+
+Card ids run 0-51 in the same order as utils.DECK: card = rank * 4 + suit,
+where rank is 0 (deuce) through 12 (ace) and suit indexes SUITS. Strings
+like 'Ah' only show up at the I/O edges via card() / card_str().
+"""
+
+from itertools import permutations
+
+
+RANKS = '23456789TJQKA'
+SUITS = 'hsdc'
+
+NUM_CARDS = 52
+DECK = list(range(NUM_CARDS))
+
+CARD_STRS = [r + s for r in RANKS for s in SUITS]
+CARD_IDS = {s: i for i, s in enumerate(CARD_STRS)}
+
+RANK = [c >> 2 for c in DECK]  # 0-12
+SUIT = [c & 3 for c in DECK]  # 0-3
+VALUE = [r + 2 for r in RANK]  # 2-14, same scale as utils.c_lookup
+
+RANK_BIT = [1 << r for r in RANK]  # 13 bit rank masks
+SUIT_BIT = [1 << s for s in SUIT]  # 4 bit suit masks
+CARD_BIT = [1 << c for c in DECK]  # 52 bit hand masks
+
+
+def card(s):
+    """'Ah' -> 50"""
+    return CARD_IDS[s[0].upper() + s[1].lower()]
+
+
+def card_str(c):
+    return CARD_STRS[c]
+
+
+def cards(strs):
+    return [CARD_IDS[s[0].upper() + s[1].lower()] for s in strs]
+
+
+def cards_str(ids):
+    return [CARD_STRS[c] for c in ids]
+
+
+def hand_mask(hand):
+    mask = 0
+    for c in hand:
+        mask |= CARD_BIT[c]
+    return mask
+
+
+def rank_mask(hand):
+    mask = 0
+    for c in hand:
+        mask |= RANK_BIT[c]
+    return mask
+
+
+def suit_rank_masks(hand):
+    """One 13 bit rank mask per suit, used for flush detection."""
+    masks = [0, 0, 0, 0]
+    for c in hand:
+        masks[c & 3] |= RANK_BIT[c]
+    return masks
+
+
+# two card hands in colex order: id = hi * (hi - 1) // 2 + lo
+HOLE_HANDS = [(hi, lo) for hi in DECK for lo in range(hi)]
+NUM_HOLE_HANDS = len(HOLE_HANDS)  # 1326
+
+
+def hole_index(hand):
+    hi, lo = max(hand), min(hand)
+    return hi * (hi - 1) // 2 + lo
+
+
+SUIT_PERMS = list(permutations(range(4)))  # suit relabellings, identity first
+
+
+def permute_suits(hand, perm):
+    return [(c & ~3) | perm[c & 3] for c in hand]
+
+
+def suit_stabilizer(hand):
+    """Suit permutations that map hand onto itself."""
+    mask = hand_mask(hand)
+    return [p for p in SUIT_PERMS if hand_mask(permute_suits(hand, p)) == mask]
+
+
+def mask_cards(mask):
+    return [c for c in DECK if mask & CARD_BIT[c]]
+
+
+_treys_cards = None
+
+
+def to_treys(hand):
+    global _treys_cards
+    if _treys_cards is None:  # treys is only needed by the table
+        import treys
+        _treys_cards = [treys.Card.new(s) for s in CARD_STRS]
+
+    return [_treys_cards[c] for c in hand]
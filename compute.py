@@ -1,23 +1,25 @@
-from itertools import combinations as comb
-from collections import defaultdict, Counter
+from itertools import combinations as comb, chain
+from collections import defaultdict
+from functools import lru_cache
 from tqdm import tqdm
 from datetime import datetime
 import json
 import os
 import numpy as np
 
+import canonical
+import cards
+import lookup
+import profiling
 import utils
 
+BATCH_SIZE = 1 << 16
+
 
 def make_hole_card_combo_dict(possible_hole_cards):
     hole_combos = {}
-    for (card1, card2) in possible_hole_cards:
-        name = f"{card1[0]}{card2[0]}"
-        if hole_combos.get(f"{card2[0]}{card1[0]}"):
-            name = f"{card2[0]}{card1[0]}"
-
-        if card1[-1] != card2[-1] and card1[0] != card2[0]:  # off suited
-            name += 'o'
+    for hand in possible_hole_cards:
+        name = utils.get_combo_from_hand(hand)
 
         if not hole_combos.get(name):
             hole_combos[name] = 0
@@ -31,87 +33,123 @@ def get_single_card_scores(cards, num):
     return sum([x / (15**(i + 1)) for i, x in enumerate(cards[:num])])
 
 
-def get_score(cards):
-    counts = defaultdict(int)
-    for card in cards:
-        counts[card[0]] += 1
+def get_straight_high(values):
+    mask = 0
+    for value in values:
+        mask |= 1 << value
+    if mask & (1 << 14):  # ace plays low too
+        mask |= 1 << 1
+
+    for high in range(14, 4, -1):
+        if (mask >> (high - 4)) & 0b11111 == 0b11111:
+            return high
+    return 0
 
-    suit_counts = defaultdict(int)
-    for card in cards:
-        suit_counts[card[1]] += 1
+
+@profiling.timed(items=lambda hand: 1)
+def get_score(hand):
+    counts = [0] * 15
+    suit_counts = [0] * 4
+    for card in hand:
+        counts[cards.VALUE[card]] += 1
+        suit_counts[card & 3] += 1
 
     big = []
     small = []
-    cards_s = sorted([utils.c_lookup[x[0]] for x in cards], reverse=True)
-    for card, num in counts.items():
+    cards_s = sorted([cards.VALUE[x] for x in hand], reverse=True)
+    for value in range(14, 1, -1):
+        num = counts[value]
         if num == 4:  # 4 of a kind!
             high = cards_s[0]
-            if high == utils.c_lookup[card]:
+            if high == value:
                 high = cards_s[4]
-            return 105 + utils.c_lookup[card] + high / 15
+            return 105 + value + high / 15
         elif num == 3:
-            big += [card]
+            big += [value]
         elif num == 2:
-            small += [card]
+            small += [value]
 
     if len(big) == 2:  # full house with two triples
-        if utils.c_lookup[big[0]] > utils.c_lookup[big[1]]:
-            return 90 + utils.c_lookup[big[0]] + utils.c_lookup[big[1]] / 15
-        else:
-            return 90 + utils.c_lookup[big[1]] + utils.c_lookup[big[0]] / 15
+        return 90 + big[0] + big[1] / 15
 
     if len(big) == 1 and len(small) >= 1:  # Full house 3 + 2
-        return 90 + utils.c_lookup[big[0]] + max([utils.c_lookup[x[0]] for x in small]) / 15
+        return 90 + big[0] + small[0] / 15
 
     # Flush:
-    for suit, count in suit_counts.items():
+    for suit, count in enumerate(suit_counts):
         if count >= 5:  # FLUSH
-            flush_cards = sorted([utils.c_lookup[x[0]] for x in cards if x[1] == suit], reverse=True)[:5]
-            straight_counter = 0
-            last_num = cards_s[0]
-            for num in cards_s[1:]:
-                if num == last_num - 1:
-                    straight_counter += 1
-                if straight_counter == 4 or (straight_counter == 3 and num == 2 and cards_s[0] == 14):
-                    # Straight Flush lol
-                    return 120 + get_single_card_scores(flush_cards, 5)
-                last_num = num
+            flush_cards = sorted([cards.VALUE[x] for x in hand if x & 3 == suit], reverse=True)
+            straight_high = get_straight_high(flush_cards)
+            if straight_high:  # Straight Flush lol
+                return 120 + straight_high
 
             return 75 + get_single_card_scores(flush_cards, 5)
 
     # Straight
-    straight_counter = 0
-    last_num = cards_s[0]
-    for num in cards_s[1:]:
-        if num == last_num - 1:
-            straight_counter += 1
-
-        if straight_counter == 4 or (straight_counter == 3 and num == 2 and cards_s[0] == 14):
-            return 60 + (num + 4)
-
-        if num != last_num - 1 and num != last_num:
-            straight_counter = 0
-
-        last_num = num
+    straight_high = get_straight_high(cards_s)
+    if straight_high:
+        return 60 + straight_high
 
     # Three of a kind
     if len(big) == 1 and len(small) == 0:
-        high = sorted([utils.c_lookup[x[0]] for x in cards if x not in big], reverse=True)
-        return 45 + utils.c_lookup[big[0]] + (high[0] / 15) + (high[1] / (15**2))
+        high = [x for x in cards_s if x != big[0]]
+        return 45 + big[0] + (high[0] / 15) + (high[1] / (15**2))
 
     if len(small) >= 2:  # 2 pair
-        top = max([utils.c_lookup[x[0]] for x in small])
-        bottom = max([utils.c_lookup[x[0]] for x in small if utils.c_lookup[x[0]] != top])
-        high = max([utils.c_lookup[x[0]] for x in cards if x not in small])
+        top, bottom = small[0], small[1]
+        high = max([x for x in cards_s if x != top and x != bottom])
         return 30 + top + (bottom / 15) + (high / (15**2))
 
     if len(small) == 1:
-        high = sorted([utils.c_lookup[x[0]] for x in cards if x not in small], reverse=True)
-        return 15 + utils.c_lookup[small[0]] + get_single_card_scores(high, 3)
+        high = [x for x in cards_s if x != small[0]]
+        return 15 + small[0] + get_single_card_scores(high, 3)
 
     return get_single_card_scores(cards_s, 5)
 
 
+def _get_scores_chunk(hands, noflush, flush):
+    num_hands, num_cards = hands.shape
+    ranks = hands >> 2
+    suits = hands & 3
+    rows = np.arange(num_hands)[:, None]
+
+    # rank / suit histograms per hand, one bincount over offset ids
+    counts = np.bincount((rows * 13 + ranks).ravel(), minlength=num_hands * 13).reshape(num_hands, 13).T
+    suit_counts = np.bincount((rows * 4 + suits).ravel(), minlength=num_hands * 4).reshape(num_hands, 4)
+
+    # lookup.HASH_NP[i, rem, q] on the flattened table
+    hash_table = lookup.HASH_NP.ravel()
+    _, rem_stride, q_stride = lookup.HASH_NP.shape
+    h = np.full(num_hands, lookup.OFFSET[num_cards], dtype=np.intp)
+    rem = np.full(num_hands, num_cards * q_stride, dtype=np.intp)
+    for i in range(13):
+        h += hash_table[i * rem_stride * q_stride + rem + counts[i]]
+        rem -= counts[i] * q_stride
+    scores = noflush[h]
+
+    flush_suit = suit_counts.argmax(1)
+    is_flush = suit_counts[rows[:, 0], flush_suit] >= lookup.MIN_CARDS
+    if is_flush.any():
+        in_suit = suits[is_flush] == flush_suit[is_flush, None]
+        masks = (in_suit << ranks[is_flush]).sum(1)
+        scores[is_flush] = flush[masks]
+
+    return scores
+
+
+@profiling.timed(items=lambda hands: len(hands))
+def get_scores_batch(hands):
+    """(N, 5-7) array of card ids -> (N,) integer ranks, same order as get_score."""
+    noflush, flush, _ = lookup.get_tables()
+    hands = np.asarray(hands, dtype=np.intp)
+    scores = np.empty(len(hands), dtype=np.int32)
+    for start in range(0, len(hands), BATCH_SIZE):
+        chunk = hands[start:start + BATCH_SIZE]
+        scores[start:start + BATCH_SIZE] = _get_scores_chunk(chunk, noflush, flush)
+
+    return scores
+
+
 def do_tests():
     tests = [
         # ('Ah', 'Ks', 'Qc', 'Jh', 'Th', '2c', '2s'),  # Straight
@@ -126,20 +164,13 @@ def do_tests():
         ('2h', '2s', '2c', '2d', 'Kh', 'Ks', '3s')
     ]
     for test in tests:
-        print(get_score(test))
+        print(get_score(cards.cards(test)))
 
 
 def get_card_lookup(possible_hole_cards, hole_combos):
     lookup = defaultdict(list)
-    for (card1, card2) in possible_hole_cards:
-        name = f"{card1[0]}{card2[0]}"
-        if hole_combos.get(f"{card2[0]}{card1[0]}"):
-            name = f"{card2[0]}{card1[0]}"
-
-        if card1[-1] != card2[-1] and card1[0] != card2[0]:  # off suited
-            name += 'o'
-
-        lookup[name] += [(card1, card2)]
+    for hand in possible_hole_cards:
+        lookup[utils.get_combo_from_hand(hand)] += [hand]
     return lookup
 
 
@@ -158,18 +189,69 @@ def setup():
     return deck, possible_hole_cards, hole_combos, card_lookup  # , all_boards
 
 
-def is_flush_possible(cards):
-    suit_counts = defaultdict(int)
-    for card in cards:
-        suit_counts[card[1]] += 1
+def is_flush_possible(hand):
+    suit_counts = [0] * 4
+    for card in hand:
+        suit_counts[card & 3] += 1
 
-    for suit, count in suit_counts.items():
+    for count in suit_counts:
         if count >= 3:
             return True
 
 
+@lru_cache(maxsize=None)
+def get_combination_index(n, k):
+    """All k of n index combinations as an (n C k, k) uint8 array."""
+    flat = np.fromiter(chain.from_iterable(comb(range(n), k)), dtype=np.uint8)
+    return flat.reshape(-1, k)
+
+
+def get_board_classes(hand, num_board=5):
+    """
+    Boards left after hand, one per suit isomorphism class (suit relabellings
+    that keep hand as is). Returns (boards, weights), weights being how many
+    real boards each class stands for.
+    """
+    deck = np.array([c for c in cards.DECK if c not in hand], dtype=np.uint8)
+    boards = deck[get_combination_index(len(deck), num_board)]
+
+    bits = np.uint64(1) << np.arange(cards.NUM_CARDS, dtype=np.uint64)
+    masks = bits[boards].sum(1)
+    is_canonical = np.ones(len(boards), dtype=bool)
+    fixed = np.zeros(len(boards), dtype=np.int64)
+    perms = cards.suit_stabilizer(hand)
+    for perm in perms:
+        perm_masks = bits[cards.permute_suits(cards.DECK, perm)][boards].sum(1)
+        is_canonical &= masks <= perm_masks
+        fixed += masks == perm_masks
+
+    # orbit size = |group| / |boards stabilizer|
+    return boards[is_canonical], len(perms) // fixed[is_canonical]
+
+
+@profiling.timed
+def get_holecard_histogram(hand):
+    """Exact weighted histogram of lookup ranks over every 5 card board."""
+    boards, weights = get_board_classes(hand)
+    hands = np.concatenate([np.broadcast_to(np.array(hand, dtype=np.uint8), (len(boards), 2)), boards], axis=1)
+
+    return np.bincount(get_scores_batch(hands), weights=weights, minlength=lookup.num_ranks() + 1)
+
+
+def get_hist_percentile(hist, q):
+    """np.percentile(scores, q) of the get_score values a rank histogram stands for."""
+    values = lookup.get_tables()[2]
+    cum = np.cumsum(hist)
+    pos = q / 100 * (cum[-1] - 1)
+    lo, hi = int(np.floor(pos)), int(np.ceil(pos))
+    value_lo = values[np.searchsorted(cum, lo, side='right')]
+    value_hi = values[np.searchsorted(cum, hi, side='right')]
+
+    return value_lo + (value_hi - value_lo) * (pos - lo)
+
+
 def get_scores_for_holecards():
-    deck, possible_hole_cards, hole_combos = setup()  # , all_boards
+    hole_combos = make_hole_card_combo_dict(comb(cards.DECK, 2))
 
     if 'hole_card_medians.json' in os.listdir():
         with open("hole_card_medians.json", "r") as jsonFile:
@@ -186,17 +268,8 @@ def get_scores_for_holecards():
         real_hands = [x for x in hands_dict.keys()]
         hand = real_hands[0]
 
-        deck.remove(hand[0])
-        deck.remove(hand[1])
-
-        board_combos = [x for x in combinations(deck, 5)]
-
-        cum_score = []
-        for board in board_combos:
-            cum_score += [get_score(hand + board)]
-
-        deck += [hand[0], hand[1]]
-        score = round(np.median(cum_score), 4)
+        hist = get_holecard_histogram(hand)
+        score = round(get_hist_percentile(hist, 50), 4)
         data[str_hand] = score
 
         print("Ave hand score for hand:", str_hand, "->", score)
@@ -223,24 +296,87 @@ def calculate_hole_card_win_percentage(ave_hand_score, hole_combos):
     return out_data
 
 
+def _get_river_equities(board, dead=()):
+    """(hole ids, equities) of every live combo vs one random live villain combo on a 5 card board."""
+    deck = np.array([c for c in cards.DECK if c not in board and c not in dead], dtype=np.intp)
+    num_live = len(deck)
+    pairs = get_combination_index(num_live, 2).astype(np.intp)  # indexes into deck
+    combos = deck[pairs]
+    scores = get_scores_batch(np.concatenate([combos, np.broadcast_to(np.array(board), (len(combos), 5))], axis=1))
+    # only the order matters, compress to the ranks that occur
+    _, scores = np.unique(scores, return_inverse=True)
+    num_ranks = scores.max() + 1
+
+    # prefix sums of villain scores: over all combos, and over the combos holding each live card
+    hist = np.bincount(scores, minlength=num_ranks)
+    card_hist = np.bincount((pairs * num_ranks + scores[:, None]).ravel(), minlength=num_live * num_ranks)
+    card_hist = card_hist.reshape(num_live, num_ranks)
+    below = np.cumsum(hist) - hist
+    card_below = np.cumsum(card_hist, axis=1) - card_hist
+
+    # remove villains sharing a card with hero, the hero combo itself is the only one holding both
+    a, b = pairs[:, 0], pairs[:, 1]
+    wins = below[scores] - card_below[a, scores] - card_below[b, scores]
+    ties = hist[scores] - card_hist[a, scores] - card_hist[b, scores] + 1
+    num_villains = len(combos) - 2 * (num_live - 1) + 1
+
+    return utils.get_hole_ids(combos), (wins + ties / 2) / num_villains
+
+
+@profiling.timed
+def get_range_equities(board, dead=()):
+    """
+    Equity of every hole card combo against one uniformly random villain
+    combo, with card removal, averaged over every runout of a 3-5 card board.
+    Returns a (1326,) array indexed by cards.hole_index, nan for dead combos.
+    """
+    board = list(board)
+    equity_sum = np.zeros(cards.NUM_HOLE_HANDS)
+    runouts = np.zeros(cards.NUM_HOLE_HANDS)
+    deck = [c for c in cards.DECK if c not in board and c not in dead]
+    for runout in comb(deck, 5 - len(board)):
+        ids, equities = _get_river_equities(board + list(runout), dead)
+        equity_sum[ids] += equities
+        runouts[ids] += 1
+
+    with np.errstate(invalid='ignore'):
+        return equity_sum / runouts
+
+
+def _get_hero_equity(hand, board):
+    """
+    get_range_equities for hand alone, with hand and board as dead cards. A
+    villain's 7 cards are the board plus the set {runout, villain combo}, so
+    every such set is scored once and shared by all its runout / villain splits.
+    """
+    deck = np.array([c for c in cards.DECK if c not in hand and c not in board], dtype=np.intp)
+    num_live, num_runout = len(deck), 5 - len(board)
+    board = np.array(board, dtype=np.intp)
+    keys = num_live ** np.arange(num_runout)  # runout index set -> slot in hero
+
+    # hero's score on every runout
+    runouts = get_combination_index(num_live, num_runout).astype(np.intp) if num_runout else np.zeros((1, 0), dtype=np.intp)
+    hero = np.zeros(num_live ** num_runout, dtype=np.int32)
+    hero_hands = np.concatenate([np.broadcast_to(np.array(hand, dtype=np.intp), (len(runouts), 2)),
+                                 np.broadcast_to(board, (len(runouts), len(board))), deck[runouts]], axis=1)
+    hero[runouts @ keys] = get_scores_batch(hero_hands)
+
+    # villain's score for every board + runout + villain card set
+    sets = get_combination_index(num_live, num_runout + 2).astype(np.intp)
+    villain = get_scores_batch(np.concatenate([np.broadcast_to(board, (len(sets), len(board))), deck[sets]], axis=1))
+
+    # every (runout, villain) pair is one split of one set, so the mean over splits is the mean over runouts
+    shares = 0.0
+    splits = list(comb(range(num_runout + 2), num_runout))
+    for split in splits:
+        split_hero = hero[sets[:, list(split)] @ keys]
+        shares += ((villain < split_hero).sum() + 0.5 * (villain == split_hero).sum())
+    return float(shares / (len(sets) * len(splits)))
+
+
+@canonical.cached_by_class('known_board_equity')
 def get_known_board_equity(hand, b):
-    start = datetime.now()
-    deck = utils.make_deck()
-    deck = [x for x in deck if x not in hand + b]
-
-    hero_scores = [get_score(x + b + hand) for x in comb(deck, 2)]
-    median = np.median(hero_scores)
-
-    all_scores = [get_score(h + b + x) for h in comb(deck, 2) for x in comb(deck, 2) if h[0] not in x and h[1] not in x]
-    wins = 0
-    for score, count in Counter(all_scores).items():
-        if median > score:
-            wins += count
-        elif median == score:
-            wins += count / 2
-
-    print(f"Took: {(datetime.now() - start).seconds} to determine GTO equity")
-    return wins / len(all_scores)
+    return _get_hero_equity(list(hand), list(b))
 
 
 def main():
@@ -0,0 +1,125 @@
+"""
+Sparse win / play counters indexed by suit isomorphism class of (hole cards, board).
+
+Every (hole, board) deal is mapped to its canonical.canonicalize class and
+packed into one int64 id (colex rank of the canonical board * 1326 +
+cards.hole_index of the canonical hole cards). Counters are kept as sorted
+id / plays / wins arrays holding only the classes seen so far, 16 bytes
+each, with new batches merged in every FLUSH_SIZE entries. Wins are stored
+in half units (win = 2, tie = 1) so merging counters stays exact.
+"""
+from math import comb
+import numpy as np
+# local imports
+import canonical
+import cards
+import utils
+
+
+FLUSH_SIZE = 1 << 22  # pending entries merged into the sorted arrays at a time
+
+# BINOM[n, k] = n C k for colex ranking
+BINOM = np.array([[comb(n, k) for k in range(6)] for n in range(cards.NUM_CARDS + 1)], dtype=np.int64)
+
+
+def get_board_ids(boards):
+    """(N, 5) boards in any order -> colex rank of each sorted board."""
+    boards = np.sort(boards, axis=1)
+    return sum(BINOM[boards[:, i], i + 1] for i in range(boards.shape[1]))
+
+
+def get_board_cards(board_id, num_cards=5):
+    """Inverse of get_board_ids for a single board."""
+    board = []
+    for k in range(num_cards, 0, -1):
+        c = k - 1
+        while BINOM[c + 1, k] <= board_id:
+            c += 1
+        board_id -= BINOM[c, k]
+        board = [c] + board
+    return board
+
+
+def get_class_ids(holes, boards):
+    """(N, 2) hole cards and (N, 5) boards -> packed class id of each deal."""
+    holes, boards = canonical.canonicalize_batch(holes, boards)
+    return get_board_ids(boards) * cards.NUM_HOLE_HANDS + utils.get_hole_ids(holes.astype(np.int64))
+
+
+def get_class_cards(class_id):
+    """Canonical (hole cards, board) of a packed class id."""
+    board_id, hole_id = divmod(int(class_id), cards.NUM_HOLE_HANDS)
+    return list(reversed(cards.HOLE_HANDS[hole_id])), get_board_cards(board_id)
+
+
+class ClassCounter:
+
+    def __init__(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.plays = np.zeros(0, dtype=np.uint32)
+        self.wins = np.zeros(0, dtype=np.uint32)
+        self.pending = []  # (ids, plays, wins) not merged yet
+        self.num_pending = 0
+
+    def add(self, class_ids, shares):
+        """Count one play per entry, shares being 1 for a win, 0.5 for a tie, 0 for a loss."""
+        ids, inverse = np.unique(class_ids, return_inverse=True)
+        plays = np.bincount(inverse, minlength=len(ids)).astype(np.uint32)
+        wins = np.bincount(inverse, weights=np.asarray(shares) * 2, minlength=len(ids)).astype(np.uint32)
+        self.pending.append((ids, plays, wins))
+        self.num_pending += len(ids)
+        if self.num_pending >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Merge the pending batches into the sorted arrays."""
+        if not self.pending:
+            return
+
+        ids, plays, wins = (np.concatenate(column) for column in zip(*self.pending))
+        self.pending, self.num_pending = [], 0
+        ids, inverse = np.unique(ids, return_inverse=True)
+        plays = np.bincount(inverse, weights=plays, minlength=len(ids)).astype(np.uint32)
+        wins = np.bincount(inverse, weights=wins, minlength=len(ids)).astype(np.uint32)
+
+        pos = np.searchsorted(self.ids, ids)
+        found = pos < len(self.ids)
+        found[found] = self.ids[pos[found]] == ids[found]
+        self.plays[pos[found]] += plays[found]
+        self.wins[pos[found]] += wins[found]
+
+        new = ~found
+        self.ids = np.insert(self.ids, pos[new], ids[new])
+        self.plays = np.insert(self.plays, pos[new], plays[new])
+        self.wins = np.insert(self.wins, pos[new], wins[new])
+
+    def merge(self, other):
+        other.flush()
+        self.pending.append((other.ids, other.plays, other.wins))
+        self.flush()
+
+    def __len__(self):
+        self.flush()
+        return len(self.ids)
+
+    def save(self, file):
+        """Compact export of the classes seen."""
+        self.flush()
+        np.savez(file, ids=self.ids, plays=self.plays, wins=self.wins)
+
+    @classmethod
+    def load(cls, file):
+        counter = cls()
+        data = np.load(file)
+        counter.ids, counter.plays, counter.wins = data['ids'], data['plays'], data['wins']
+        return counter
+
+    def get_percentages(self):
+        """{canonical.canonicalize class id: win rate} for every class seen."""
+        self.flush()
+        rates = self.wins / (2 * self.plays)
+        percentages = {}
+        for class_id, rate in zip(self.ids.tolist(), rates.tolist()):
+            hole, board = get_class_cards(class_id)
+            percentages[cards.hand_mask(hole) | (cards.hand_mask(board) << cards.NUM_CARDS)] = rate
+        return percentages
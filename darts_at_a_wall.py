@@ -1,79 +1,153 @@
-from collections import defaultdict
+from multiprocessing import Pool, cpu_count
 from tqdm import tqdm
-import operator
-import random
+import numpy as np
+import argparse
 import json
+import os
 # local imports
-import compute
+import cards
+import evaluator
+import lookup
+import profiling
 import utils
 
 
-ROUNDS = 1000000  # 1 million
-EPOCHS = 5
+ROUNDS = 5000000  # 5 million deals per player count
 NUM_PLAYERS = 9
-# Total iterations of get_score --> rounds * epochs * num_players = 45 mil
-
-
-def shuffle_and_draw():
-    deck = utils.make_deck().copy()
-    random.shuffle(deck)
-    board = tuple(deck[:5])
-    deck = deck[5:]
-
-    return deck, board
-
-
-all_holecard_percentages = {}
-for num_players in range(2, NUM_PLAYERS + 1):
-    # print("Calculating holecard % for", num_players, "players using", ROUNDS, "epochs")
-    all_holecard_percentages[str(num_players)] = {}
-    hand_wins = defaultdict(int)
-    hand_plays = defaultdict(int)
-    for epoch in tqdm(range(EPOCHS)):
-        for i in range(ROUNDS):
-            deck, board = shuffle_and_draw()
-            hands = []
-            for i in range(num_players):
-                h = tuple(deck[i * 2: (i + 1) * 2])
-                if utils.c_lookup[h[0][0]] < utils.c_lookup[h[1][0]]:
-                    h = (h[1], h[0])
-                elif h[0][0] == h[1][0] and h[0][1] < h[1][1]:
-                    h = (h[1], h[0])
-
-                hands += [(h, compute.get_score(h + board))]
-                hand_plays[h] += 1
-
-            winner_hands = sorted(hands, key=operator.itemgetter(1), reverse=True)
-            if winner_hands[0][1] > winner_hands[1][1]:  # Clear winner
-                hand_wins[winner_hands[0][0]] += 1
-            else:  # ties
-                winning_val = winner_hands[0][1]
-                for hand in winner_hands:
-                    if hand[1] == winning_val:
-                        hand_wins[hand[0]] += 0.5
-                    else:
-                        break
-
-        # Assert every hole card pair is seen at least once
-        assert(len(hand_plays) == 1326)
-        hand_win_percents = {key: val / hand_plays[key] for key, val in hand_wins.items()}
-        # average over hands of similar type
-        combos = utils.get_combos_from_hand_dict(hand_win_percents)
-        adj_percent = {key: sum(val) / len(val) for key, val in combos.items()}
-
-        for combo in adj_percent:
-            if not all_holecard_percentages[str(num_players)].get(combo):
-                all_holecard_percentages[str(num_players)][combo] = []
-            all_holecard_percentages[str(num_players)][combo] += [adj_percent[combo]]
-
-for player in all_holecard_percentages:
-    for combo, val_list in all_holecard_percentages[player].items():
-        all_holecard_percentages[player][combo] = 1.0 * sum(val_list) / len(val_list)
-
-for num_players in all_holecard_percentages:
-    h = sorted(all_holecard_percentages[num_players].items(), key=lambda x: x[1], reverse=True)
-    for up in h:
-        print(up[0], up[1])
-
-with open("./dart_lookups/hole_card_percentages_2.json", "w") as jsonFile:
-    json.dump(all_holecard_percentages, jsonFile)
+SEED = 0
+BATCH_SIZE = 1 << 14  # deals per vectorized batch inside a worker
+NUM_SHARDS = 64  # fixed so a seed gives the same result on any number of cores
+WAVE_ROUNDS = 500000  # rounds between convergence checks with --target-width
+CI_Z = 1.96  # 95% confidence intervals
+# Total iterations of get_score --> rounds * num_players summed over 2..9 players = 220 mil
+
+
+def simulate(args):
+    """Worker: play rounds deals with its own RNG stream, return local (hand_wins, hand_wins_sq, hand_plays)."""
+    num_players, rounds, seed_seq = args
+    rng = np.random.default_rng(seed_seq)
+    hand_wins = np.zeros(cards.NUM_HOLE_HANDS)
+    hand_wins_sq = np.zeros(cards.NUM_HOLE_HANDS)
+    hand_plays = np.zeros(cards.NUM_HOLE_HANDS, dtype=np.int64)
+
+    for start in range(0, rounds, BATCH_SIZE):
+        num_deals = min(BATCH_SIZE, rounds - start)
+        deck = utils.deal_batch(rng, num_deals, 5 + 2 * num_players)
+        board = deck[:, :5]
+        holes = deck[:, 5:].reshape(num_deals, num_players, 2)
+
+        winners = evaluator.get_evaluator(exact=True).get_winners_batch(holes, board)
+        # clear winner gets 1, every tied winner gets 0.5
+        shares = np.where(winners.sum(1, keepdims=True) > 1, 0.5, 1.0) * winners
+
+        ids = utils.get_hole_ids(holes).ravel()
+        hand_plays += np.bincount(ids, minlength=cards.NUM_HOLE_HANDS)
+        hand_wins += np.bincount(ids, weights=shares.ravel(), minlength=cards.NUM_HOLE_HANDS)
+        hand_wins_sq += np.bincount(ids, weights=shares.ravel() ** 2, minlength=cards.NUM_HOLE_HANDS)
+
+    return hand_wins, hand_wins_sq, hand_plays
+
+
+@profiling.timed(items=lambda pool, num_players, rounds, seed_seq, num_shards: rounds * num_players)
+def run(pool, num_players, rounds, seed_seq, num_shards):
+    """Shard rounds across the pool and merge the per worker counts."""
+    shard_rounds = [rounds // num_shards + (i < rounds % num_shards) for i in range(num_shards)]
+    jobs = [(num_players, r, s) for r, s in zip(shard_rounds, seed_seq.spawn(num_shards))]
+
+    hand_wins = np.zeros(cards.NUM_HOLE_HANDS)
+    hand_wins_sq = np.zeros(cards.NUM_HOLE_HANDS)
+    hand_plays = np.zeros(cards.NUM_HOLE_HANDS, dtype=np.int64)
+    for wins, wins_sq, plays in tqdm(pool.imap_unordered(simulate, jobs), total=num_shards):
+        hand_wins += wins  # sums of halves and quarters, exact in any order
+        hand_wins_sq += wins_sq
+        hand_plays += plays
+
+    return hand_wins, hand_wins_sq, hand_plays
+
+
+def get_combo_ci(hand_wins, hand_wins_sq, hand_plays):
+    """95% CI half width of every combo's win rate (the mean of its hands' win rates)."""
+    plays = np.maximum(hand_plays, 1)
+    p = hand_wins / plays
+    var = np.where(hand_plays > 1, (hand_wins_sq / plays - p ** 2) / (plays - 1), np.inf)
+
+    combos = utils.get_combos_from_hand_dict({cards.HOLE_HANDS[i]: var[i] for i in range(cards.NUM_HOLE_HANDS)})
+    return {key: CI_Z * np.sqrt(sum(val)) / len(val) for key, val in combos.items()}
+
+
+def run_until_precise(pool, num_players, target_width, max_rounds, seed_seq):
+    """Run waves of rounds until every combo's CI is narrower than target_width (or max_rounds)."""
+    totals = [np.zeros(cards.NUM_HOLE_HANDS), np.zeros(cards.NUM_HOLE_HANDS), np.zeros(cards.NUM_HOLE_HANDS, dtype=np.int64)]
+    rounds = 0
+    while rounds < max_rounds:
+        wave = min(WAVE_ROUNDS, max_rounds - rounds)
+        for total, counts in zip(totals, run(pool, num_players, wave, seed_seq.spawn(1)[0], NUM_SHARDS)):
+            total += counts
+        rounds += wave
+
+        ci = get_combo_ci(*totals)
+        width = 2 * max(ci.values())
+        print(f"{num_players} players: {rounds} rounds, widest CI {width:.5f}")
+        if width < target_width:
+            break
+
+    return totals, rounds, ci
+
+
+def get_combo_percentages(hand_wins, hand_plays):
+    # Assert every hole card pair is seen at least once
+    assert((hand_plays > 0).all())
+    hand_win_percents = {cards.HOLE_HANDS[i]: hand_wins[i] / hand_plays[i] for i in range(cards.NUM_HOLE_HANDS)}
+    # average over hands of similar type
+    combos = utils.get_combos_from_hand_dict(hand_win_percents)
+    return {key: sum(val) / len(val) for key, val in combos.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo hole card win rates for 2..N players.")
+    parser.add_argument('--rounds', type=int, default=ROUNDS)
+    parser.add_argument('--players', type=int, default=NUM_PLAYERS)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--processes', type=int, default=cpu_count())
+    parser.add_argument('--target-width', type=float, default=None,
+                        help="stop once every combo's 95%% CI is narrower than this, --rounds becomes the cap")
+    parser.add_argument('--out', default="./dart_lookups/hole_card_percentages.json", help="read by poker_v2.GTOPlayer")
+    parser.add_argument('--precision-out', default="./dart_lookups/hole_card_precision.json")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+
+    lookup.load_tables()  # build once before the workers map it
+    root = np.random.SeedSequence(args.seed)
+    all_holecard_percentages = {}
+    all_precision = {}
+    with profiling.session(args), Pool(args.processes) as pool:
+        for num_players, seed_seq in zip(range(2, args.players + 1), root.spawn(args.players - 1)):
+            if args.target_width:
+                (hand_wins, hand_wins_sq, hand_plays), rounds, ci = run_until_precise(
+                    pool, num_players, args.target_width, args.rounds, seed_seq)
+            else:
+                hand_wins, hand_wins_sq, hand_plays = run(pool, num_players, args.rounds, seed_seq, NUM_SHARDS)
+                rounds, ci = args.rounds, get_combo_ci(hand_wins, hand_wins_sq, hand_plays)
+
+            all_holecard_percentages[str(num_players)] = get_combo_percentages(hand_wins, hand_plays)
+            all_precision[str(num_players)] = {'rounds': rounds, 'max_ci_width': 2 * max(ci.values()), 'ci': ci}
+
+    for num_players in all_holecard_percentages:
+        h = sorted(all_holecard_percentages[num_players].items(), key=lambda x: x[1], reverse=True)
+        for up in h:
+            print(up[0], up[1])
+
+    for num_players, precision in all_precision.items():
+        print(f"{num_players} players: {precision['rounds']} rounds, widest 95% CI {precision['max_ci_width']:.5f}")
+
+    for path in [args.out, args.precision_out]:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(args.out, "w") as jsonFile:
+        json.dump(all_holecard_percentages, jsonFile)
+
+    with open(args.precision_out, "w") as jsonFile:
+        json.dump(all_precision, jsonFile)
+
+
+if __name__ == '__main__':
+    main()
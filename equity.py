@@ -0,0 +1,77 @@
+"""
+Anytime Monte Carlo equity against several random opponents.
+
+EquityEstimator samples opponent holdings and runouts in small vectorized
+batches, a fixed number of deals per refine() so seeded runs reproduce
+whatever the machine load, keeping running sums so later refine() calls
+keep tightening the same estimate. Equity is the expected
+pot share: 1 for a win, 1 / k for a k way tie.
+"""
+import numpy as np
+# local imports
+import cards
+import evaluator
+import profiling
+
+
+BATCH_SIZE = 64  # deals per vectorized batch
+NUM_SAMPLES = 512  # deals per refine() by default, about 2ms
+
+shared_rng = np.random.default_rng()  # shared by estimators that aren't given one
+
+
+def seed(seed=None):
+    """Reseed the shared generator, like random.seed."""
+    global shared_rng
+    shared_rng = np.random.default_rng(seed)
+
+
+class EquityEstimator:
+
+    def __init__(self, hand, board, num_opponents, rng=None):
+        self.hand = list(hand)
+        self.board = list(board)
+        self.num_opponents = num_opponents
+        self.rng = rng or shared_rng
+        self.deck = np.array([c for c in cards.DECK if c not in self.hand + self.board])
+        self.samples = 0
+        self.share_sum = 0.0
+        self.share_sq_sum = 0.0
+
+    @profiling.timed(items=lambda self, num_deals: num_deals)
+    def sample(self, num_deals):
+        num_runout = 5 - len(self.board)
+        order = np.argsort(self.rng.random((num_deals, len(self.deck))), axis=1)
+        dealt = self.deck[order[:, :num_runout + 2 * self.num_opponents]]
+
+        boards = np.concatenate([np.broadcast_to(self.board, (num_deals, len(self.board))), dealt[:, :num_runout]], axis=1)
+        holes = np.concatenate([np.broadcast_to(self.hand, (num_deals, 1, 2)),
+                                dealt[:, num_runout:].reshape(num_deals, self.num_opponents, 2)], axis=1)
+        winners = evaluator.get_evaluator(exact=True).get_winners_batch(holes, boards)
+        shares = winners[:, 0] / winners.sum(1)
+
+        self.samples += num_deals
+        self.share_sum += shares.sum()
+        self.share_sq_sum += (shares ** 2).sum()
+
+    def refine(self, num_samples=NUM_SAMPLES, batch_size=BATCH_SIZE):
+        """Sample num_samples more deals, in batches of batch_size."""
+        for start in range(0, num_samples, batch_size):
+            self.sample(min(batch_size, num_samples - start))
+        return self.equity, self.stderr
+
+    @property
+    def equity(self):
+        return float(self.share_sum / self.samples) if self.samples else 0.0
+
+    @property
+    def stderr(self):
+        if self.samples < 2:
+            return float('inf')
+        var = (self.share_sq_sum / self.samples - self.equity ** 2) * self.samples / (self.samples - 1)
+        return float(np.sqrt(max(var, 0.0) / self.samples))
+
+
+def get_equity(hand, board, num_opponents, num_samples=NUM_SAMPLES):
+    """(equity, standard error) from num_samples random deals."""
+    return EquityEstimator(hand, board, num_opponents).refine(num_samples)
@@ -0,0 +1,148 @@
+"""
+One interface over the hand evaluators in this repo.
+
+Every backend takes hands as lists / arrays of cards.py ids (5-7 cards) and
+provides:
+    get_score(hand)          backend native score, higher is better
+    get_scores_batch(hands)  (N, 5-7) array -> (N,) scores
+    get_rank(hand)           dense hand rank 1 - 7462, higher is better
+    get_ranks_batch(hands)   (N, 5-7) array -> (N,) ranks
+    get_winners_batch(holes, boards)
+
+Backends marked exact order hands like treys does, so their ranks agree.
+compute_v2 and calc.scores are older approximations that only provide
+scores, so they can't pick winners: get_winners_batch refuses them and the
+table, bots and simulations ask for get_evaluator(exact=True).
+
+The backend used by the table, bots and simulations is DEFAULT_BACKEND,
+which can be set with the POKER_EVALUATOR environment variable.
+"""
+from itertools import combinations
+import numpy as np
+import os
+# local imports
+import cards
+import compute
+import lookup
+
+
+NUM_RANKS = 7462
+DEFAULT_BACKEND = os.environ.get('POKER_EVALUATOR', 'lookup')
+
+
+class Evaluator:
+    name = None
+    exact = True
+
+    def get_score(self, hand):
+        raise NotImplementedError
+
+    def get_rank(self, hand):
+        raise NotImplementedError(f"{self.name} scores don't map onto hand ranks")
+
+    def get_scores_batch(self, hands):
+        return np.array([self.get_score(hand) for hand in np.asarray(hands).tolist()], dtype=float)
+
+    def get_ranks_batch(self, hands):
+        return np.array([self.get_rank(hand) for hand in np.asarray(hands).tolist()], dtype=np.int32)
+
+    def get_winners_batch(self, holes, boards):
+        """(N, P, 2) hole cards and (N, 5) boards -> (N, P) bool, True for every winner (ties share)."""
+        if not self.exact:
+            raise ValueError(f"evaluator {self.name!r} only approximates hand order, use one of {EXACT_BACKENDS}")
+        holes = np.asarray(holes, dtype=np.intp)
+        boards = np.asarray(boards, dtype=np.intp)
+        num_deals, num_players = holes.shape[:2]
+
+        hands = np.concatenate([holes, np.broadcast_to(boards[:, None, :], (num_deals, num_players, boards.shape[1]))], axis=2)
+        scores = self.get_scores_batch(hands.reshape(num_deals * num_players, -1)).reshape(num_deals, num_players)
+
+        return scores == scores.max(1, keepdims=True)
+
+
+class LookupEvaluator(Evaluator):
+    """Perfect hash tables (lookup.py), vectorized batches through compute.get_scores_batch."""
+    name = 'lookup'
+
+    def get_score(self, hand):
+        return lookup.get_rank(hand)
+
+    def get_rank(self, hand):
+        return lookup.get_rank(hand)
+
+    def get_scores_batch(self, hands):
+        return compute.get_scores_batch(hands)
+
+    def get_ranks_batch(self, hands):
+        return compute.get_scores_batch(hands)
+
+
+class ComputeEvaluator(Evaluator):
+    """compute.get_score, the pure Python reference the lookup tables are built from."""
+    name = 'compute'
+
+    def get_score(self, hand):
+        return compute.get_score(hand)
+
+    def get_rank(self, hand):
+        return int(np.searchsorted(lookup.get_tables()[2], compute.get_score(hand)))
+
+
+class TreysEvaluator(Evaluator):
+    """treys.Evaluator, lower treys scores are better so ranks are flipped."""
+    name = 'treys'
+
+    def __init__(self):
+        import treys
+        self.evaluator = treys.Evaluator()
+
+    def get_score(self, hand):
+        return self.get_rank(hand)
+
+    def get_rank(self, hand):
+        return NUM_RANKS + 1 - self.evaluator.evaluate(cards.to_treys(hand[:2]), cards.to_treys(hand[2:]))
+
+
+class ComputeV2Evaluator(Evaluator):
+    """compute_v2.get_score on (rank 1 - 13, suit) tuples, ace = 13."""
+    name = 'compute_v2'
+    exact = False
+
+    def __init__(self):
+        import compute_v2
+        self.score = compute_v2.get_score
+
+    def get_score(self, hand):
+        return self.score([(cards.RANK[c] + 1, cards.SUIT[c]) for c in hand])
+
+
+class CalcEvaluator(Evaluator):
+    """calc.scores.score_hand on 'H14' style strings, best 5 card subset for 6-7 cards."""
+    name = 'calc'
+    exact = False
+    CARD_STRS = [f"{cards.SUITS[cards.SUIT[c]].upper()}{cards.VALUE[c]}" for c in cards.DECK]
+
+    def __init__(self):
+        from calc.scores import score_hand
+        self.score = score_hand
+
+    def get_score(self, hand):
+        strs = [self.CARD_STRS[c] for c in hand]
+        return max(self.score(list(five)) for five in combinations(strs, 5))
+
+
+BACKENDS = {backend.name: backend for backend in
+            [LookupEvaluator, ComputeEvaluator, TreysEvaluator, ComputeV2Evaluator, CalcEvaluator]}
+EXACT_BACKENDS = sorted(name for name, backend in BACKENDS.items() if backend.exact)
+
+_evaluators = {}
+
+
+def get_evaluator(name=None, exact=False):
+    """Shared instance of a backend, DEFAULT_BACKEND if no name is given. exact=True rejects backends without ranks."""
+    name = name or DEFAULT_BACKEND
+    if exact and name not in EXACT_BACKENDS:
+        raise ValueError(f"evaluator {name!r} has no hand ranks, use one of {EXACT_BACKENDS}")
+    if name not in _evaluators:
+        _evaluators[name] = BACKENDS[name]()
+    return _evaluators[name]
@@ -0,0 +1,114 @@
+"""
+Append only, columnar hand history for simulated games.
+
+Every action is one fixed width integer record:
+    hand    uint32  hand number (Table.round_counter)
+    seat    int8    player number, -1 for table events (board dealt)
+    street  uint8   PREFLOP, FLOP, TURN, RIVER, SHOWDOWN
+    action  uint8   BLIND, FOLD, CHECK, CALL, RAISE, ALL_IN, DEAL, SHOW, WIN
+    amount  int64   bet total for the street, hand rank (1 - 7462) for SHOW, chips won for WIN
+                    (one WIN per side pot winner)
+    pot     int64   chips already in the middle from earlier streets
+    board   uint64  card mask (cards.hand_mask) of the board so far
+
+Records are buffered in plain lists (one append per column, a few hundred
+ns per action) and written every chunk_size records as one .npy file per
+column under path/chunk_NNNNNN/, so chunks can be memory mapped back
+without reading the whole history.
+"""
+import numpy as np
+import os
+# local imports
+import cards
+
+
+CHUNK_SIZE = 1 << 20  # records per chunk
+
+COLUMNS = [('hand', np.uint32), ('seat', np.int8), ('street', np.uint8), ('action', np.uint8),
+           ('amount', np.int64), ('pot', np.int64), ('board', np.uint64)]
+
+STREETS = ['PREFLOP', 'FLOP', 'TURN', 'RIVER', 'SHOWDOWN']
+PREFLOP, FLOP, TURN, RIVER, SHOWDOWN = range(len(STREETS))
+BOARD_STREET = {0: PREFLOP, 3: FLOP, 4: TURN, 5: RIVER}
+
+ACTIONS = ['BLIND', 'FOLD', 'CHECK', 'CALL', 'RAISE', 'ALL_IN', 'DEAL', 'SHOW', 'WIN']
+BLIND, FOLD, CHECK, CALL, RAISE, ALL_IN, DEAL, SHOW, WIN = range(len(ACTIONS))
+
+
+class HandHistory:
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        """Appends after any chunks already under path."""
+        self.path = path
+        self.chunk_size = chunk_size
+        os.makedirs(path, exist_ok=True)
+        self.num_chunks = len(get_chunk_dirs(path))
+        self.columns = [[] for _ in COLUMNS]
+        self.hand = 0
+        self.street = PREFLOP
+        self.board = 0
+
+    def start_hand(self, hand):
+        self.hand = hand
+        self.street = PREFLOP
+        self.board = 0
+
+    def deal(self, board, pot):
+        """Record the board for a new street, later actions are tagged with it."""
+        self.street = BOARD_STREET.get(len(board), SHOWDOWN)
+        self.board = cards.hand_mask(board)
+        self.add(-1, DEAL, 0, pot)
+
+    def showdown(self):
+        self.street = SHOWDOWN
+
+    def add(self, seat, action, amount, pot):
+        hand, seats, streets, actions, amounts, pots, boards = self.columns
+        hand.append(self.hand)
+        seats.append(seat)
+        streets.append(self.street)
+        actions.append(action)
+        amounts.append(amount)
+        pots.append(pot)
+        boards.append(self.board)
+        if len(hand) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.columns[0]:
+            return
+
+        chunk_dir = os.path.join(self.path, f"chunk_{self.num_chunks:06d}")
+        os.makedirs(chunk_dir, exist_ok=True)
+        for (name, dtype), column in zip(COLUMNS, self.columns):
+            np.save(os.path.join(chunk_dir, f"{name}.npy"), np.array(column, dtype=dtype))
+            column.clear()
+        self.num_chunks += 1
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def get_chunk_dirs(path):
+    if not os.path.isdir(path):
+        return []
+    return sorted(os.path.join(path, d) for d in os.listdir(path) if d.startswith('chunk_'))
+
+
+def load_chunks(path):
+    """Yield {column: memory mapped array} for each chunk under path, in write order."""
+    for chunk_dir in get_chunk_dirs(path):
+        yield {name: np.load(os.path.join(chunk_dir, f"{name}.npy"), mmap_mode='r') for name, _ in COLUMNS}
+
+
+def load(path):
+    """{column: array} for the whole history (copies, for histories that fit in memory)."""
+    chunks = list(load_chunks(path))
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) if chunks else np.zeros(0, dtype)
+            for name, dtype in COLUMNS}
@@ -0,0 +1,150 @@
+"""
+Perfect hash lookup evaluator for 5-7 card hands.
+
+Hands without a flush only depend on how many of each rank they hold, so the
+13 rank counts are hashed with a minimal perfect hash (the lexicographic index
+of the count vector among all vectors with the same number of cards) into the
+NOFLUSH table. Flush hands only depend on the ranks in the flush suit, which
+index the FLUSH table directly as a 13 bit mask.
+
+Both tables hold dense integer ranks (higher is better) built once from
+compute.get_score, so they order hands exactly like get_score does. They are
+saved as .npy files under LOOKUP_DIR and opened with mmap on first use.
+"""
+import os
+import numpy as np
+# local imports
+import cards
+
+
+LOOKUP_DIR = './lookup_tables'
+MIN_CARDS = 5
+MAX_CARDS = 7
+MAX_PER_RANK = 4
+
+
+def _count_vectors(num_ranks, total):
+    """Number of rank count vectors over num_ranks ranks summing to total."""
+    if num_ranks == 0:
+        return int(total == 0)
+    return sum(_count_vectors(num_ranks - 1, total - q) for q in range(min(total, MAX_PER_RANK) + 1))
+
+
+# HASH[rank][cards left][count]: vectors that sort before this count at this rank
+HASH = [[[sum(_count_vectors(12 - i, rem - v) for v in range(q) if rem - v >= 0)
+          for q in range(MAX_PER_RANK + 1)]
+         for rem in range(MAX_CARDS + 1)]
+        for i in range(13)]
+HASH_NP = np.array(HASH, dtype=np.int32)
+
+OFFSET = [0] * (MAX_CARDS + 2)
+for _n in range(MIN_CARDS, MAX_CARDS + 1):
+    OFFSET[_n + 1] = OFFSET[_n] + _count_vectors(13, _n)
+NOFLUSH_SIZE = OFFSET[MAX_CARDS + 1]
+FLUSH_SIZE = 1 << 13
+
+_tables = None
+
+
+def hash_counts(counts, num_cards):
+    h = OFFSET[num_cards]
+    rem = num_cards
+    for i in range(13):
+        q = counts[i]
+        if q:
+            h += HASH[i][rem][q]
+            rem -= q
+            if rem == 0:
+                break
+    return h
+
+
+def _iter_counts(num_ranks, total):
+    """Count vectors in hash order."""
+    if num_ranks == 0:
+        if total == 0:
+            yield []
+        return
+    for q in range(min(total, MAX_PER_RANK) + 1):
+        for rest in _iter_counts(num_ranks - 1, total - q):
+            yield [q] + rest
+
+
+def _hand_from_counts(counts):
+    """Any hand with these rank counts and no flush (suits dealt round robin)."""
+    hand = []
+    for rank, q in enumerate(counts):
+        for _ in range(q):
+            hand += [rank * 4 + len(hand) % 4]
+    return hand
+
+
+def build_tables(path=LOOKUP_DIR):
+    import compute  # compute imports this module for its batch evaluator
+
+    noflush_scores = np.zeros(NOFLUSH_SIZE)
+    for num_cards in range(MIN_CARDS, MAX_CARDS + 1):
+        for counts in _iter_counts(13, num_cards):
+            h = hash_counts(counts, num_cards)
+            noflush_scores[h] = compute.get_score(_hand_from_counts(counts))
+
+    flush_scores = np.full(FLUSH_SIZE, -1.0)
+    for mask in range(FLUSH_SIZE):
+        if MIN_CARDS <= bin(mask).count('1') <= MAX_CARDS:
+            flush_scores[mask] = compute.get_score([r * 4 for r in range(13) if mask & (1 << r)])
+
+    # rank 0 is reserved for "not a flush" in the flush table
+    values = np.unique(np.concatenate([noflush_scores, flush_scores[flush_scores >= 0]]))
+    noflush = np.searchsorted(values, noflush_scores).astype(np.uint16) + 1
+    flush = np.where(flush_scores >= 0, np.searchsorted(values, flush_scores) + 1, 0).astype(np.uint16)
+    values = np.concatenate([[0.0], values])
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'noflush.npy'), noflush)
+    np.save(os.path.join(path, 'flush.npy'), flush)
+    np.save(os.path.join(path, 'values.npy'), values)
+    print(f"Built lookup tables in {path}: {len(values) - 1} distinct hand ranks")
+
+
+def load_tables(path=LOOKUP_DIR):
+    global _tables
+    if not os.path.exists(os.path.join(path, 'values.npy')):
+        build_tables(path)
+
+    # plain ndarray views of the maps, memmap.__getitem__ is slow for scalars
+    _tables = tuple(np.asarray(np.load(os.path.join(path, name + '.npy'), mmap_mode='r'))
+                    for name in ('noflush', 'flush', 'values'))
+    return _tables
+
+
+def get_tables():
+    """(noflush, flush, values) memory mapped arrays, built on first use."""
+    return _tables or load_tables()
+
+
+def get_rank(hand):
+    """Integer rank of a 5-7 card hand, higher is better."""
+    noflush, flush, _ = _tables or load_tables()
+    counts = [0] * 13
+    suit_counts = [0, 0, 0, 0]
+    for c in hand:
+        counts[c >> 2] += 1
+        suit_counts[c & 3] += 1
+
+    for suit in range(4):
+        if suit_counts[suit] >= MIN_CARDS:
+            mask = 0
+            for c in hand:
+                if c & 3 == suit:
+                    mask |= cards.RANK_BIT[c]
+            return int(flush[mask])
+    return int(noflush[hash_counts(counts, len(hand))])
+
+
+def get_value(rank):
+    """compute.get_score value for a rank."""
+    return float(get_tables()[2][rank])
+
+
+def num_ranks():
+    return len(get_tables()[2]) - 1
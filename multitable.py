@@ -0,0 +1,228 @@
+"""
+Lockstep simulator for thousands of independent tables.
+
+Table state lives in arrays (stacks, bets, pots, active masks, hole cards,
+boards), one row per table, and every betting decision is taken for all
+tables whose action is on the same seat at once. Policies are vectorized
+versions of the poker_v2 bots and showdowns go through the default
+evaluator backend.
+
+Stacks are reset to starting_stack every hand and results accumulate in
+winnings, so every seat can always cover the same maximum and no side
+pots are needed: a seat's winnings are its share of the pot minus what it
+put in.
+"""
+from abc import abstractmethod
+import numpy as np
+import argparse
+# local imports
+import cards
+import evaluator
+import utils
+
+
+NUM_TABLES = 10000
+NUM_PLAYERS = 3
+STARTING_STACK = 1000
+BIG_BLIND = 10
+MAX_RAISES = 4  # per street, further raises become calls
+FOLD, CALL, RAISE = 0, 1, 2
+VISIBLE_BOARD = [0, 3, 4, 5]  # per street
+PREFLOP_BOARD = cards.cards(['2h', '5s', '7c'])  # same hack as NaivePlayer
+
+
+class Policy:
+
+    @abstractmethod
+    def act(self, sim, tables, seat):
+        """(actions, bet targets) for seat at each of tables, targets are totals for the street."""
+        raise NotImplementedError
+
+
+class RandomPolicy(Policy):
+    """RandomPlayer as array operations."""
+
+    def act(self, sim, tables, seat):
+        n = len(tables)
+        rng = sim.rng
+        actions = np.where(rng.integers(0, sim.num_players, n) > 0, FOLD,
+                           np.where(rng.integers(0, 4, n) > 1, CALL, RAISE))
+        pot = sim.get_pots(tables)
+        targets = rng.uniform(pot / 2, pot)
+        return actions, targets
+
+
+class ThresholdPolicy(Policy):
+    """NaivePlayer as array operations: raise / call / fold on made hand strength vs bet size."""
+
+    def act(self, sim, tables, seat):
+        rng = sim.rng
+        win_percent = sim.get_strengths(tables, seat)
+        pot = sim.get_pots(tables)
+        current = sim.current[tables]
+        bet_size = current / (pot + current)
+
+        strong = win_percent > bet_size
+        raise_bool = rng.uniform(0, win_percent) < (win_percent - bet_size)
+        balance_call = rng.uniform(0, np.maximum(bet_size, 1e-9)) < (win_percent * 0.8)
+        actions = np.where(strong, np.where(raise_bool, RAISE, CALL), np.where(balance_call, CALL, FOLD))
+        low = np.maximum(current, sim.big_blind)
+        targets = rng.uniform(low, np.maximum(low, (2 * win_percent * pot) + (pot / 2) + 5))
+        return actions, targets
+
+
+class MultiTableSim:
+
+    def __init__(self, policies, num_tables=NUM_TABLES, starting_stack=STARTING_STACK, big_blind=BIG_BLIND, seed=None):
+        self.policies = policies
+        self.num_tables = num_tables
+        self.num_players = len(policies)
+        self.starting_stack = starting_stack
+        self.big_blind = big_blind
+        self.rng = np.random.default_rng(seed)
+        self.hands_played = 0
+        self.winnings = np.zeros((num_tables, self.num_players))
+
+        shape = (num_tables, self.num_players)
+        self.stacks = np.zeros(shape)
+        self.bets = np.zeros(shape)
+        self.contributed = np.zeros(shape)
+        self.active = np.zeros(shape, dtype=bool)
+        self.pots = np.zeros(num_tables)
+        self.current = np.zeros(num_tables)
+        self.holes = np.zeros((num_tables, self.num_players, 2), dtype=np.intp)
+        self.boards = np.zeros((num_tables, 5), dtype=np.intp)
+        self.street = 0
+        self._strengths = None
+
+    def get_pots(self, tables):
+        return self.pots[tables] + self.bets[tables].sum(1)
+
+    def get_strengths(self, tables, seat):
+        """Made hand rank percentile (0-1) of seat at tables, computed once per street."""
+        if self._strengths is None:
+            seen = VISIBLE_BOARD[self.street]
+            boards = self.boards[:, :seen] if seen else np.broadcast_to(PREFLOP_BOARD, (self.num_tables, 3))
+            hands = np.concatenate([self.holes, np.broadcast_to(boards[:, None, :], (self.num_tables, self.num_players, boards.shape[1]))], axis=2)
+            ranks = evaluator.get_evaluator(exact=True).get_ranks_batch(hands.reshape(-1, hands.shape[2])).reshape(self.num_tables, self.num_players)
+            self._strengths = (ranks - 1) / evaluator.NUM_RANKS
+        return self._strengths[tables, seat]
+
+    def _pay(self, tables, seats, amounts):
+        amounts = np.minimum(amounts, self.stacks[tables, seats])
+        self.stacks[tables, seats] -= amounts
+        self.bets[tables, seats] += amounts
+
+    def _betting_round(self, first):
+        """Betting for every table at once, first[t] being the first seat to act."""
+        seats = np.arange(self.num_players)
+        to_act = self.active & (self.stacks > 0)
+        last = (first - 1) % self.num_players
+        raises = np.zeros(self.num_tables, dtype=np.intp)
+
+        while True:
+            pending = to_act & (self.active.sum(1) >= 2)[:, None]
+            # next pending seat after the last actor
+            dist = np.where(pending, (seats - last[:, None] - 1) % self.num_players, self.num_players)
+            actor = dist.argmin(1)
+            tables = np.flatnonzero(pending.any(1))
+            if len(tables) == 0:
+                return
+
+            for seat, policy in enumerate(self.policies):
+                t = tables[actor[tables] == seat]
+                if len(t) == 0:
+                    continue
+
+                actions, targets = policy.act(self, t, seat)
+                to_call = self.current[t] - self.bets[t, seat]
+                actions = np.where((actions == FOLD) & (to_call <= 0), CALL, actions)  # free check
+                # legal raise: at least double the bet and a big blind, at most all in
+                targets = np.minimum(np.maximum(targets, np.maximum(2 * self.current[t], self.big_blind)),
+                                     self.bets[t, seat] + self.stacks[t, seat])
+                is_raise = (actions == RAISE) & (raises[t] < MAX_RAISES) & (targets > self.current[t])
+                is_call = (actions != FOLD) & ~is_raise
+
+                folds = t[actions == FOLD]
+                self.active[folds, seat] = False
+
+                self._pay(t[is_call], seat, to_call[is_call])
+
+                r = t[is_raise]
+                self._pay(r, seat, targets[is_raise] - self.bets[r, seat])
+                self.current[r] = self.bets[r, seat]
+                raises[r] += 1
+                to_act[r] = self.active[r] & (self.stacks[r] > 0)
+
+                to_act[t, seat] = False
+                last[t] = seat
+
+    def _end_street(self):
+        self.pots += self.bets.sum(1)
+        self.contributed += self.bets
+        self.bets[:] = 0
+        self.current[:] = 0
+        self._strengths = None
+
+    def play_hand(self):
+        num_tables, num_players = self.num_tables, self.num_players
+        tables = np.arange(num_tables)
+        button = np.full(num_tables, self.hands_played % num_players)
+        self.hands_played += 1
+
+        deck = utils.deal_batch(self.rng, num_tables, 5 + 2 * num_players)
+        self.boards[:] = deck[:, :5]
+        self.holes[:] = deck[:, 5:].reshape(num_tables, num_players, 2)
+        self.stacks[:] = self.starting_stack
+        self.active[:] = True
+        self.contributed[:] = 0
+        self.pots[:] = 0
+        self.bets[:] = 0
+        self._strengths = None
+
+        # blinds
+        self.street = 0
+        self._pay(tables, (button + 1) % num_players, np.full(num_tables, self.big_blind / 2))
+        self._pay(tables, (button + 2) % num_players, np.full(num_tables, self.big_blind))
+        self.current[:] = self.big_blind
+        self._betting_round((button + 3) % num_players)
+        self._end_street()
+
+        for street in range(1, 4):
+            self.street = street
+            self._betting_round((button + 1) % num_players)
+            self._end_street()
+
+        # showdown, folded seats can't win
+        hands = np.concatenate([self.holes, np.broadcast_to(self.boards[:, None, :], (num_tables, num_players, 5))], axis=2)
+        scores = evaluator.get_evaluator(exact=True).get_scores_batch(hands.reshape(-1, 7)).reshape(num_tables, num_players)
+        scores = np.where(self.active, scores, -1)
+        winners = scores == scores.max(1, keepdims=True)
+
+        self.winnings += winners * (self.pots / winners.sum(1))[:, None] - self.contributed
+
+    def run(self, num_hands):
+        for _ in range(num_hands):
+            self.play_hand()
+        return self.winnings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lockstep bot vs bot evaluation over many tables.")
+    parser.add_argument('--tables', type=int, default=NUM_TABLES)
+    parser.add_argument('--hands', type=int, default=100, help="hands per table")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    policies = [ThresholdPolicy()] + [RandomPolicy() for _ in range(1, NUM_PLAYERS)]
+    sim = MultiTableSim(policies, args.tables, seed=args.seed)
+    winnings = sim.run(args.hands)
+
+    total_hands = args.tables * args.hands
+    for seat, policy in enumerate(policies):
+        bb_100 = winnings[:, seat].sum() / BIG_BLIND / total_hands * 100
+        print(f"Seat {seat} ({type(policy).__name__}): {bb_100:.2f} bb/100 over {total_hands} hands")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,18 @@
 import random
 from abc import abstractmethod
-import treys
+from time import perf_counter
+import argparse
+import logging
 import json
+import os
 # local imports
+import canonical
+import cards
+import equity
+import evaluator
+import history
+import profiling
+import stats
 import utils
 # import compute
 
@@ -11,6 +21,15 @@ NUM_PLAYERS = 3
 STARTING_STACK = 100000
 NUM_ROUNDS = 1000
 STARTING_BB = 10
+EQUITY_CACHE_SIZE = 100000
+EQUITY_SAMPLES = 512  # Monte Carlo deals per postflop decision, a count so seeded runs reproduce
+EQUITY_TARGET_SE = 0.01  # stop refining a cached estimate below this standard error
+HOLE_CARD_PERCENTAGES = './dart_lookups/hole_card_percentages.json'  # written by darts_at_a_wall.py
+
+# Narration goes through this logger: INFO for table actions, DEBUG for bot
+# internals. Nothing is enabled by default, so batch runs stay quiet and
+# disabled calls cost one level check (heavier messages are guarded).
+log = logging.getLogger('poker_v2')
 
 
 class Player:
@@ -24,35 +43,49 @@ class Player:
     def get_bet(self, table):
         raise NotImplementedError
 
+    def get_opponent_rates(self, table, street=None, position=None):
+        """{player num: stats rates} for the other players still in the hand."""
+        return {i: table.stats.get_rates(i, street, position)
+                for i, active in enumerate(table.active) if active and i != self.num}
+
 
 class GTOPlayer(Player):
     def __init__(self, num, stack, var=0.15):
         super().__init__(num, stack)
-        self.hole_card_percentages = json.load(open('./dart_lookups/hole_card_percentages.json'))
+        if not os.path.exists(HOLE_CARD_PERCENTAGES):
+            raise FileNotFoundError(f"GTOPlayer needs preflop win rates in {HOLE_CARD_PERCENTAGES}, "
+                                    f"generate them with: python darts_at_a_wall.py --out {HOLE_CARD_PERCENTAGES}")
+        with open(HOLE_CARD_PERCENTAGES, "r") as jsonFile:
+            self.hole_card_percentages = json.load(jsonFile)
         self.defensive_variation = var
 
     def get_pot_odds(self, current_bet, pot):
         return current_bet / (current_bet + pot)
 
+    @profiling.timed
     def get_equity(self, table, num_players):
         if len(table.board) == 0:    # Hole Cards.
             combo_name = utils.get_combo_from_hand(self.hand)
-            equity = self.hole_card_percentages[str(num_players)][combo_name]
-            print(f"got GTO equity for hole cards {self.hand} as: [{equity}]")
-            return equity
+            hole_equity = self.hole_card_percentages[str(num_players)][combo_name]
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("got GTO equity for hole cards %s as: [%s]", cards.cards_str(self.hand), hole_equity)
+            return hole_equity
         else:
-            # use Treys
-            b = [treys.Card.new(x) for x in table.board]
-            h = [treys.Card.new(x) for x in self.hand]
-            raw = table.evaluator.evaluate(h, b)
-            raw_win_percent = 1 - table.evaluator.get_five_card_rank_percentage(raw)
+            # equity only depends on the suit isomorphism class, shared across the table
+            key = (canonical.canonicalize(self.hand, table.board)[0], num_players)
+            estimator = table.equity_cache.get(key)
+            if estimator is None:
+                estimator = equity.EquityEstimator(self.hand, table.board, num_players - 1)
+                table.equity_cache.set(key, estimator)
 
-            print(raw, raw_win_percent, raw_win_percent - (((num_players - 2) * 8) / 100))
+            # anytime Monte Carlo vs the other players, a cache hit keeps refining the same estimate
+            if estimator.stderr > EQUITY_TARGET_SE:
+                estimator.refine(EQUITY_SAMPLES)
 
-            return raw_win_percent - (0.14 / (num_players - 2))
+            return estimator.equity
 
     def get_bet(self, table):
-        num_players = len(table.players)
+        num_players = max(table.active.count(True), 2)
         pot, min_call = table.get_adjusted_pot(), table.current_bet - self.chips_in_front
 
         equity = self.get_equity(table, num_players)
@@ -60,8 +93,9 @@ class GTOPlayer(Player):
         pot_odds = self.get_pot_odds(min_call, pot)
         min_bet = max(table.current_bet * 2, table.big_blind)
 
-        print("pot:", pot, "equity:", equity, "pot odds:", pot_odds, "ev:", expected_value, "min_call:", min_call)
-        print("min_bet", min_bet, "ev_bet:", equity * (pot + 2*min_bet) - min_bet, "ev_call:", equity * (pot + 2*min_call) - min_call)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("pot: %s equity: %s pot odds: %s ev: %s min_call: %s", pot, equity, pot_odds, expected_value, min_call)
+            log.debug("min_bet %s ev_bet: %s ev_call: %s", min_bet, equity * (pot + 2*min_bet) - min_bet, equity * (pot + 2*min_call) - min_call)
 
         if equity < pot_odds:  # Check fold
             if min_call == 0:  # CHECK
@@ -85,17 +119,16 @@ class GTOPlayer(Player):
 
 
 class NaivePlayer(Player):
+    PREFLOP_BOARD = cards.cards(['2h', '5s', '7c'])
 
+    @profiling.timed
     def get_bet(self, table):
-        to_eval = []
         if len(table.board) == 0:  # major hack for evaluate function
-            to_eval = [treys.Card.new(card) for card in ['2h', '5s', '7c']]
+            to_eval = self.PREFLOP_BOARD
         else:
-            to_eval += [treys.Card.new(card) for card in table.board]
+            to_eval = table.board
 
-        raw = table.evaluator.evaluate([treys.Card.new(x) for x in self.hand], to_eval)
-
-        win_percent = 1 - table.evaluator.get_five_card_rank_percentage(raw)
+        win_percent = (table.evaluator.get_rank(self.hand + to_eval) - 1) / evaluator.NUM_RANKS
         adj_pot = table.get_adjusted_pot()
         bet_size = 1.0 * table.current_bet / (adj_pot + table.current_bet)
 
@@ -169,19 +202,24 @@ class ManualPlayerAssist(Player):
 
 class Table:
 
-    def __init__(self, num_players, starting_big_blind, hands_per_bb):
+    def __init__(self, num_players, starting_big_blind, hands_per_bb, history=None, seed=None):
         self.players = []
         self.order = [i for i in range(num_players)]
         self.board = []
         self.active = [True for _ in range(num_players)]
-        self.deck = utils.make_deck()
-        self.evaluator = treys.Evaluator()
+        self.deck = utils.Deck(seed)
+        self.evaluator = evaluator.get_evaluator(exact=True)
+        self.equity_cache = canonical.LRUCache(EQUITY_CACHE_SIZE)
         self.big_blind = starting_big_blind
         self.pot = 0
+        self.contributed = [0 for _ in range(num_players)]  # chips each player put in this hand
+        self.payouts = None  # {player num: chips won} after a showdown
         self.current_bet = 0
         self.hands_per_bb = hands_per_bb
         self.round_counter = 0
         self.aggressor = None
+        self.history = history  # optional history.HandHistory
+        self.stats = stats.TableStats(num_players)  # opponent frequencies for the bots
 
     def get_adjusted_pot(self):
         pot = self.pot
@@ -202,32 +240,53 @@ class Table:
         else:  # Illegal bet larger than current bet, but not 2x
             return self.current_bet
 
+    def get_legal_bet(self, player, bet):
+        """Bot bet as a legal total: short bets become calls, nothing exceeds what the player has."""
+        if bet is None:  # folding with nothing to call is a check
+            return None if player.chips_in_front < self.current_bet else player.chips_in_front
+        return min(max(bet, self.current_bet), player.stack + player.chips_in_front)
+
+    def record(self, player, action, amount, raised=False):
+        """Feed one action to the stats and the optional hand history."""
+        self.stats.record(player.num, action, raised)
+        if self.history:
+            self.history.add(player.num, action, amount, self.pot)
+
     def facilitate_bet(self, player, bet, blind=False):
         if blind and bet == self.big_blind:
-            print(f"Player {player.num} (BB) antes: ${bet}")
+            log.info("Player %s (BB) antes: $%s", player.num, bet)
+            action = history.BLIND
         elif blind:
-            print(f"Player {player.num} (SB) antes: ${bet}")
+            log.info("Player %s (SB) antes: $%s", player.num, bet)
+            action = history.BLIND
         elif bet is None:
-            print(f"Player {player.num} folds.")
+            log.info("Player %s folds.", player.num)
+            self.record(player, history.FOLD, 0)
             return
-        elif (bet == 0 and self.current_bet == 0) or (player == self.aggressor and player.chips_in_front == bet):
-            print(f"Player {player.num} checks.")
+        elif bet == player.chips_in_front:
+            log.info("Player %s checks.", player.num)
+            self.record(player, history.CHECK, bet)
             return
-        elif bet == player.stack:
-            print(f"Player {player.num} goes ALL IN for: ${bet}")
+        elif bet == player.stack + player.chips_in_front:
+            log.info("Player %s goes ALL IN for: $%s", player.num, bet)
+            action = history.ALL_IN
         elif bet == self.current_bet:
-            print(f"Player {player.num} calls with: ${bet}.")
+            log.info("Player %s calls with: $%s.", player.num, bet)
+            action = history.CALL
         elif bet > self.current_bet:
-            print(f"Player {player.num} raises to: ${bet}.")
+            log.info("Player %s raises to: $%s.", player.num, bet)
             self.aggressor = player
+            action = history.RAISE
         else:
-            print("???", bet, self.current_bet, player.stack)
+            log.error("??? %s %s %s", bet, self.current_bet, player.stack)
             raise
 
         assert(bet > player.chips_in_front)
 
         player.stack -= (bet - player.chips_in_front)
+        self.contributed[player.num] += bet - player.chips_in_front
         player.chips_in_front = bet
+        self.record(player, action, bet, raised=bet > self.current_bet)
 
         assert(player.stack >= 0)
 
@@ -235,18 +294,22 @@ class Table:
         """Call before each hand, including first hand."""
         self.round_counter += 1
         self.order = self.order[1:] + [self.order[0]]
-        self.active = [True for _ in range(len(self.players))]
-        self.deck = utils.make_deck()
+        self.active = [player.stack > 0 for player in self.players]  # busted players sit out
+        self.deck.reset()
         self.board = []
         self.pot = 0
+        self.contributed = [0 for _ in self.players]
+        self.payouts = None
         self.current_bet = 0
-
-        random.shuffle(self.deck)
+        self.stats.start_hand(self.order)
+        if self.history:
+            self.history.start_hand(self.round_counter)
 
         # Handle big blind if needed
         if self.round_counter % (self.hands_per_bb * len(self.players)) == 0:
             self.big_blind *= 2
 
+    @profiling.timed
     def do_betting_round(self):
         checks = 0
         while True:
@@ -255,7 +318,7 @@ class Table:
                     continue
 
                 player = self.players[i]
-                if checks >= self.active.count(True):  # or (self.active.count(True) == 1
+                if checks >= self.active.count(True) or self.active.count(True) == 1:
                     # Done with betting round, action gets back to aggressor
                     for j in self.order:
                         if self.active[j]:
@@ -265,7 +328,11 @@ class Table:
                     self.aggressor = None
                     return
 
-                bet = player.get_bet(self)
+                if player.stack == 0:  # All in, nothing left to decide
+                    checks += 1
+                    continue
+
+                bet = self.get_legal_bet(player, player.get_bet(self))
                 self.facilitate_bet(player, bet)
                 if bet is None:  # Player Folds
                     self.active[i] = False
@@ -280,10 +347,12 @@ class Table:
 
     def do_preflop(self):
         sb = self.players[self.order[0]]
-        self.facilitate_bet(sb, self.big_blind / 2, blind=True)
+        if sb.stack > 0:
+            self.facilitate_bet(sb, min(self.big_blind / 2, sb.stack), blind=True)
 
         bb = self.players[self.order[1]]
-        self.facilitate_bet(bb, self.big_blind, blind=True)
+        if bb.stack > 0:
+            self.facilitate_bet(bb, min(self.big_blind, bb.stack), blind=True)
         self.aggressor = bb
         self.current_bet = self.big_blind
 
@@ -296,28 +365,30 @@ class Table:
             num = self.active.index(True)
             return self.players[num]
         elif self.active.count(True) == 0:
-            print("No actives?")
+            log.error("No actives?")
             raise
 
     def do_round(self, num_cards):
-        self.board += self.deck[:num_cards]
-        self.deck = self.deck[num_cards:]
+        self.board += self.deck.deal(num_cards)
+        self.stats.new_street(history.BOARD_STREET[len(self.board)])
+        if self.history:
+            self.history.deal(self.board, self.pot)
 
-        print("BOARD: ", self.board)
+        if log.isEnabledFor(logging.INFO):
+            log.info("BOARD: %s", cards.cards_str(self.board))
         self.do_betting_round()
 
         if self.active.count(True) == 1:
             num = self.active.index(True)
             return self.players[num]
         elif self.active.count(True) == 0:
-            print("No actives?")
+            log.error("No actives?")
             raise
 
     def do_hand(self):
-        print(f"\n*Hand number: {self.round_counter}*")
+        log.info("\n*Hand number: %s*", self.round_counter)
         for i in self.order:
-            self.players[i].hand = self.deck[:2]
-            self.deck = self.deck[2:]
+            self.players[i].hand = self.deck.deal(2)
 
         # ANTE
         winner = self.do_preflop()
@@ -336,23 +407,80 @@ class Table:
         if winner:
             return winner
         # SHOWDOWN
-        best = 8000
-        winner = None
-        treys_board = [treys.Card.new(card) for card in self.board]
+        ranks = {}
+        if self.history:
+            self.history.showdown()
         for i in self.order:
             if self.active[i]:
-                score = self.evaluator.evaluate([treys.Card.new(card) for card in self.players[i].hand], treys_board)
-                if score < best:
-                    best = score
-                    winner = self.players[i]
+                # ranks, not native scores: they're ints for the history and the table's backend is exact
+                ranks[i] = self.evaluator.get_rank(self.players[i].hand + self.board)
+                if self.history:
+                    self.history.add(i, history.SHOW, ranks[i], self.pot)
+
+        winner = self.players[max(ranks, key=ranks.get)]  # first in order on ties
+        self.payouts = self.get_payouts(ranks)
+        self.stats.showdown(ranks)
+        return winner
 
+    def get_payouts(self, ranks):
+        """
+        {player num: chips won} for showdown ranks {player num: rank}. The pot
+        is split into side pots at each all in player's contribution, so nobody
+        wins more from an opponent than they put in themselves.
+        """
+        payouts = {}
+        levels = sorted({self.contributed[i] for i in ranks})
+        prev = 0
+        for level in levels:
+            # the top pot also takes whatever folded players put in above it
+            cap = max(self.contributed) if level == levels[-1] else level
+            pot = sum(min(c, cap) - min(c, prev) for c in self.contributed)
+            eligible = [i for i in ranks if self.contributed[i] >= level]
+            best = max(eligible, key=ranks.get)
+            payouts[best] = payouts.get(best, 0) + pot
+            prev = cap
+        return payouts
+
+    @profiling.timed(items=lambda self: 1)
+    def play_hand(self):
+        """Reset, play one hand and pay out the pot, side pot by side pot. None once fewer than two players have chips."""
+        if sum(player.stack > 0 for player in self.players) < 2:
+            return None
+
+        self.reset_round()
+        winner = self.do_hand()
+
+        for num, amount in (self.payouts or {winner.num: self.pot}).items():
+            log.info("Winner: Player %s, winning pot: $%s", num, amount)
+            self.players[num].stack += amount
+            if self.history:
+                self.history.add(num, history.WIN, amount, self.pot)
+        if log.isEnabledFor(logging.INFO):
+            for player in self.players:
+                log.info("Player: %s hand: %s", player.num, cards.cards_str(player.hand))
         return winner
 
 
 def main():
     """Run all components of the game."""
+    parser = argparse.ArgumentParser(description="Simulate a table of bots.")
+    parser.add_argument('--hands', type=int, default=NUM_ROUNDS)
+    parser.add_argument('--evaluator', default=evaluator.DEFAULT_BACKEND, choices=evaluator.EXACT_BACKENDS)
+    parser.add_argument('--seed', type=int, default=None, help="seed for the deck and the bots")
+    parser.add_argument('--history', default=None, help="write a binary hand history under this dir")
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help="-v narrates the table, -vv adds bot internals")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(message)s', level=[logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)])
+
     # Make table
-    table = Table(NUM_PLAYERS, STARTING_BB, NUM_ROUNDS_PER_BB)
+    evaluator.DEFAULT_BACKEND = args.evaluator
+    # separate streams, so the cards dealt don't predict the bots' random choices
+    deck_seed, bot_seed, equity_seed = utils.spawn_seeds(args.seed, 3)
+    random.seed(bot_seed)
+    equity.seed(equity_seed)
+    table = Table(NUM_PLAYERS, STARTING_BB, NUM_ROUNDS_PER_BB, args.history and history.HandHistory(args.history), deck_seed)
 
     # Make players
     table.players += [NaivePlayer(0, STARTING_STACK)]
@@ -363,19 +491,22 @@ def main():
     assert(NUM_PLAYERS == len(table.players))
 
     # Handle scoring / winners
-    for _ in range(NUM_ROUNDS):
-        table.reset_round()
-        winner = table.do_hand()
-
-        print(f"Winner: Player {winner.num}, winning pot: ${table.pot}")
-        winner.stack += table.pot
-        for player in table.players:
-            print(f"Player: {player.num} hand: {player.hand}")
-
-    print(f"\n\nAfter {NUM_ROUNDS} rounds, the player stacks are:")
+    start = perf_counter()
+    hands = 0
+    with profiling.session(args):
+        while hands < args.hands and table.play_hand():
+            hands += 1
+    elapsed = perf_counter() - start
+    if table.history:
+        table.history.close()
+
+    print(f"\n\nAfter {hands} rounds, the player stacks are:")
     for player in table.players:
         print(f"Player {player.num}: ${player.stack}")
 
+    print(f"Equity cache: {table.equity_cache.get_stats()}")
+    print(f"{hands} hands in {elapsed:.2f}s: {hands / elapsed:.1f} hands/sec")
+
 
 if __name__ == "__main__":
     main()
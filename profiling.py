@@ -0,0 +1,107 @@
+"""
+Opt-in instrumentation for the simulation scripts.
+
+@profiling.timed marks a hot function but returns it unchanged, so nothing
+is paid unless profiling is switched on. enable() then swaps every marked
+function (or method) on its module / class for a wrapper keeping call
+counts and cumulative time, plus an items/sec gauge for functions given an
+items(*args) counter, e.g. hands evaluated per batch. Callers in this repo
+look functions up through their module, so the swap reaches them.
+
+Scripts take --profile (counters) and --profile-out FILE (a cProfile dump of
+the whole run, view with pstats / snakeviz). POKER_PROFILE=1 and
+POKER_PROFILE_OUT=FILE do the same without flags. Counters only cover the
+calling process, pool workers aren't included.
+"""
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+import cProfile
+import importlib
+import os
+import sys
+
+
+_marked = []  # (module name, qualname, items)
+stats = {}  # name: [calls, seconds, items]
+enabled = False
+
+
+def timed(fn=None, items=None):
+    """Mark fn for instrumentation, items(*args, **kwargs) counts the work done per call."""
+    def decorator(fn):
+        _marked.append((fn.__module__, fn.__qualname__, items))
+        return fn
+
+    return decorator(fn) if fn else decorator
+
+
+def _wrap(fn, name, items):
+    record = stats.setdefault(name, [0, 0.0, 0])
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            record[0] += 1
+            record[1] += perf_counter() - start
+            if items:
+                record[2] += items(*args, **kwargs)
+
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+def enable():
+    """Swap every marked function for its counting wrapper."""
+    global enabled
+    if enabled:
+        return
+
+    for module_name, qualname, items in _marked:
+        owner = sys.modules.get(module_name) or importlib.import_module(module_name)
+        *path, attr = qualname.split('.')
+        for part in path:
+            owner = getattr(owner, part)
+        fn = owner.__dict__[attr] if isinstance(owner, type) else getattr(owner, attr)
+        setattr(owner, attr, _wrap(fn, f"{module_name}.{qualname}", items))
+    enabled = True
+
+
+def report(file=None):
+    """Print the counters, slowest cumulative time first."""
+    file = file or sys.stderr
+    print(f"\n{'function':<45} {'calls':>10} {'total s':>10} {'us/call':>10} {'items/s':>12}", file=file)
+    for name, (calls, seconds, items) in sorted(stats.items(), key=lambda x: -x[1][1]):
+        if not calls:
+            continue
+        per_sec = f"{items / seconds:12,.0f}" if items and seconds else f"{'':>12}"
+        print(f"{name:<45} {calls:>10} {seconds:>10.3f} {seconds / calls * 1e6:>10.1f} {per_sec}", file=file)
+
+
+def add_arguments(parser):
+    parser.add_argument('--profile', action='store_true', default=bool(os.environ.get('POKER_PROFILE')),
+                        help="count calls and time of hot functions (or set POKER_PROFILE=1)")
+    parser.add_argument('--profile-out', default=os.environ.get('POKER_PROFILE_OUT'),
+                        help="dump a cProfile of the run here (or set POKER_PROFILE_OUT)")
+
+
+@contextmanager
+def session(args):
+    """Profile the body of a script's main() as requested by add_arguments' flags."""
+    if args.profile:
+        enable()
+    profiler = cProfile.Profile() if args.profile_out else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile_out)
+            print(f"cProfile stats written to {args.profile_out}", file=sys.stderr)
+        if args.profile:
+            report()
@@ -1,94 +1,51 @@
-from collections import defaultdict
 from tqdm import tqdm
-import random
-import json
+import numpy as np
+import argparse
 # local
+import counters
+import evaluator
+import profiling
 import utils
-from compute import get_score
 
 
-ROUNDS = 100000000 # 1 million
-EPOCHS = 1
+ROUNDS = 100000000  # 100 million
 NUM_PLAYERS = 2
+SEED = 0
+BATCH_SIZE = 1 << 16
 
 
-def get_combos_from_hand_dict(hand_data):
-    combos = {}
-    for ((card1, card2), board) in hand_data.keys():
-        name = f"{card1[0]}{card2[0]}"
-        if combos.get(f"{card2[0]}{card1[0]}"):
-            name = f"{card2[0]}{card1[0]}"
+@profiling.timed(items=lambda counter, num_players, rounds, rng: rounds * num_players)
+def simulate(counter, num_players, rounds, rng):
+    for start in tqdm(range(0, rounds, BATCH_SIZE)):
+        num_deals = min(BATCH_SIZE, rounds - start)
+        deck = utils.deal_batch(rng, num_deals, 5 + 2 * num_players)
+        board = deck[:, :5]
+        holes = deck[:, 5:].reshape(num_deals, num_players, 2)
 
-        if card1[-1] != card2[-1] and card1[0] != card2[0]:  # off suited
-            name += 'o'
+        winners = evaluator.get_evaluator(exact=True).get_winners_batch(holes, board)
+        # clear winner gets 1, every tied winner gets 0.5
+        shares = np.where(winners.sum(1, keepdims=True) > 1, 0.5, 1.0) * winners
 
-        if not combos.get((name, board)):
-            combos[(name, board)] = []
+        class_ids = counters.get_class_ids(holes.reshape(-1, 2), np.repeat(board, num_players, axis=0))
+        counter.add(class_ids, shares.ravel())
 
-        combos[(name, board)] += [hand_data[((card1, card2), board)]]
-    return combos
 
+def main():
+    parser = argparse.ArgumentParser(description="Board conditioned hole card win rates.")
+    parser.add_argument('--rounds', type=int, default=ROUNDS)
+    parser.add_argument('--players', type=int, default=NUM_PLAYERS)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--out', default="./dart_lookups/complete_counts_{}.npz")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
 
-def shuffle_and_draw(num_cards):
-    deck = utils.make_deck().copy()
-    random.shuffle(deck)
-    board = tuple(deck[:num_cards])
-    deck = deck[num_cards:]
+    root = np.random.SeedSequence(args.seed)
+    with profiling.session(args):
+        for num_players, seed_seq in zip(range(2, args.players + 1), root.spawn(args.players - 1)):
+            counter = counters.ClassCounter()
+            simulate(counter, num_players, args.rounds, np.random.default_rng(seed_seq))
+            counter.save(args.out.format(num_players))
 
-    return deck, board
 
-
-all_holecard_percentages = defaultdict(dict)
-for num_players in range(2, NUM_PLAYERS + 1):
-    hand_wins = defaultdict(int)
-    hand_plays = defaultdict(int)
-    for _ in range(EPOCHS):
-        for _ in tqdm(range(ROUNDS)):
-            deck, board = shuffle_and_draw(5)
-            hands = []
-
-            for i in range(num_players):
-                h = tuple(deck[i * 2: (i + 1) * 2])
-                if utils.c_lookup[h[0][0]] < utils.c_lookup[h[1][0]]:
-                    h = (h[1], h[0])
-                elif h[0][0] == h[1][0] and h[0][1] < h[1][1]:
-                    h = (h[1], h[0])
-
-                hands += [(h, get_score(h + board))]
-                hand_plays[(h, board)] += 1
-
-            winner_hands = sorted(hands, key=lambda x: x[1], reverse=True)
-            if winner_hands[0][1] > winner_hands[1][1]:  # Clear winner
-                hand_wins[(winner_hands[0][0], board)] += 1
-            else:  # ties
-                winning_val = winner_hands[0][1]
-                for hand in winner_hands:
-                    if hand[1] == winning_val:
-                        hand_wins[(hand[0], board)] += 0.5
-                    else:
-                        break
-
-        hand_win_percents = {key: val / hand_plays[key] for key, val in hand_wins.items()}
-        # average over hands of similar type
-        combos = get_combos_from_hand_dict(hand_win_percents)
-        adj_percent = {key: sum(val) / len(val) for key, val in combos.items()}
-
-        for combo in adj_percent:
-            if not all_holecard_percentages[str(num_players)].get(combo):
-                all_holecard_percentages[str(num_players)][combo] = []
-            all_holecard_percentages[str(num_players)][combo] += [adj_percent[combo]]
-
-
-for player in all_holecard_percentages:
-    for combo, val_list in all_holecard_percentages[player].items():
-        all_holecard_percentages[player][combo] = 1.0 * sum(val_list) / len(val_list)
-
-with open("./dart_lookups/complete_percentages.json", "w") as jsonFile:
-    sanitized = {}
-    for player in all_holecard_percentages:
-        sanitized[player] = {}
-        for key in all_holecard_percentages[player]:
-            name = key[0] + ',' + ",".join(key[1])
-            sanitized[player][name] = all_holecard_percentages[player][key]
-
-    json.dump(sanitized, jsonFile)
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Streaming per-player action frequencies (the README's player stats).
+
+TableStats is fed every voluntary action from Table.facilitate_bet and keeps
+plain int counters per player, overall / per street / per position, so an
+update is a handful of list increments and bots can read rates at any time
+without looking at past hands. Positions are seats relative to the small
+blind (0 = SB, 1 = BB, ...).
+
+Rates and their denominators:
+    fold, check, call, raise, all_in   per action taken
+    three_bet                          raises per action facing exactly one raise, i.e.
+                                       the street's second raise (blinds aren't raises)
+    bluff                              showdowns with no pair or better (rank <= BLUFF_RANK)
+                                       per showdown after betting / raising in the hand
+
+PlayerStats.snapshot() / merge() move counters between processes, e.g. to
+pool stats by player type across tournament sessions.
+"""
+import numpy as np
+# local imports
+import history
+
+
+MAX_SEATS = 10
+NUM_STREETS = 4  # preflop to river
+BLUFF_RANK = 1277  # best high card hand (ace king queen jack nine) in evaluator ranks
+
+EVENTS = ['act', 'fold', 'check', 'call', 'raise', 'all_in', 'facing_raise', 'three_bet', 'showdown_bet', 'bluff']
+ACT, FOLD, CHECK, CALL, RAISE, ALL_IN, FACING_RAISE, THREE_BET, SHOWDOWN_BET, BLUFF = range(len(EVENTS))
+NUM_EVENTS = len(EVENTS)
+
+ACTION_EVENTS = {history.FOLD: FOLD, history.CHECK: CHECK, history.CALL: CALL,
+                 history.RAISE: RAISE, history.ALL_IN: ALL_IN}
+
+# rate name: (numerator, denominator)
+RATES = {'fold': (FOLD, ACT), 'check': (CHECK, ACT), 'call': (CALL, ACT), 'raise': (RAISE, ACT),
+         'all_in': (ALL_IN, ACT), 'three_bet': (THREE_BET, FACING_RAISE), 'bluff': (BLUFF, SHOWDOWN_BET)}
+
+
+class PlayerStats:
+
+    def __init__(self):
+        self.overall = [0] * NUM_EVENTS
+        self.by_street = [[0] * NUM_EVENTS for _ in range(NUM_STREETS)]
+        self.by_position = [[0] * NUM_EVENTS for _ in range(MAX_SEATS)]
+
+    def add(self, event, street, position):
+        self.overall[event] += 1
+        self.by_street[street][event] += 1
+        self.by_position[position][event] += 1
+
+    def get_counts(self, street=None, position=None):
+        if street is not None:
+            return self.by_street[street]
+        if position is not None:
+            return self.by_position[position]
+        return self.overall
+
+    def get_rates(self, street=None, position=None):
+        """{rate name: frequency}, None where there is nothing to divide by yet."""
+        counts = self.get_counts(street, position)
+        return {name: counts[num] / counts[den] if counts[den] else None for name, (num, den) in RATES.items()}
+
+    def snapshot(self):
+        return {'overall': np.array(self.overall), 'by_street': np.array(self.by_street),
+                'by_position': np.array(self.by_position)}
+
+    def merge(self, snapshot):
+        """Add the counters of another player's snapshot()."""
+        for name in ['overall', 'by_street', 'by_position']:
+            merged = np.array(getattr(self, name)) + snapshot[name]
+            setattr(self, name, merged.tolist())
+
+
+class TableStats:
+
+    def __init__(self, num_players):
+        assert num_players <= MAX_SEATS
+        self.players = [PlayerStats() for _ in range(num_players)]
+        self.positions = list(range(num_players))
+        self.street = 0
+        self.raises = 0  # this street, blinds don't count
+        self.bettors = set()  # players who bet or raised this hand
+
+    def start_hand(self, order):
+        """order[0] is the small blind."""
+        for position, seat in enumerate(order):
+            self.positions[seat] = position
+        self.street = 0
+        self.raises = 0
+        self.bettors.clear()
+
+    def new_street(self, street):
+        self.street = street
+        self.raises = 0
+
+    def record(self, seat, action, raised=False):
+        """One history.* action by seat, raised when it put in more than the current bet. Blinds are ignored."""
+        event = ACTION_EVENTS.get(action)
+        if event is None:
+            return
+
+        player, street, position = self.players[seat], self.street, self.positions[seat]
+        player.add(ACT, street, position)
+        player.add(event, street, position)
+        if self.raises == 1:
+            player.add(FACING_RAISE, street, position)
+
+        if raised:
+            if self.raises == 1:
+                player.add(THREE_BET, street, position)
+            self.raises += 1
+            self.bettors.add(seat)
+
+    def showdown(self, ranks):
+        """{seat: evaluator rank} shown. Players who bet or raised this hand and show BLUFF_RANK or worse bluffed."""
+        for seat, rank in ranks.items():
+            if seat in self.bettors:
+                player, position = self.players[seat], self.positions[seat]
+                player.add(SHOWDOWN_BET, self.street, position)
+                if rank <= BLUFF_RANK:
+                    player.add(BLUFF, self.street, position)
+
+    def get_rates(self, seat, street=None, position=None):
+        return self.players[seat].get_rates(street, position)
+
+    def snapshot(self):
+        return [player.snapshot() for player in self.players]
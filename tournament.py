@@ -0,0 +1,130 @@
+"""
+Parallel bot vs bot sessions on poker_v2 tables.
+
+A lineup is a list of poker_v2 player class names, one per seat. Every
+session plays the lineup from fresh stacks on its own seed, sessions are
+fanned out over a process pool and results stream back as they finish.
+Win rates are aggregated per player type as bb/100 (in starting big blinds)
+with a 95% confidence interval over sessions, which are independent. Seats
+of one type in a session share its cards, so they're averaged into one
+sample per session first.
+"""
+from multiprocessing import Pool
+from time import perf_counter
+from tqdm import tqdm
+import numpy as np
+import argparse
+import random
+import json
+# local imports
+import equity
+import poker_v2
+import stats
+import utils
+
+
+LINEUP = ['GTOPlayer', 'NaivePlayer', 'RandomPlayer']
+NUM_SESSIONS = 1000
+HANDS_PER_SESSION = 100
+SEED = 0
+CI_Z = 1.96
+
+
+def play_session(args):
+    """(seed, hands played, [(player type, net chips)] per seat, stats snapshots per seat) for one seeded session."""
+    lineup, seed, num_hands = args
+    # separate streams, so the cards dealt don't predict the bots' random choices
+    deck_seed, bot_seed, equity_seed = utils.spawn_seeds(seed, 3)
+    random.seed(bot_seed)
+    equity.seed(equity_seed)
+
+    table = poker_v2.Table(len(lineup), poker_v2.STARTING_BB, poker_v2.NUM_ROUNDS_PER_BB, seed=deck_seed)
+    table.players += [getattr(poker_v2, name)(i, poker_v2.STARTING_STACK) for i, name in enumerate(lineup)]
+
+    hands = 0
+    while hands < num_hands and table.play_hand():
+        hands += 1
+
+    seats = [(name, player.stack - poker_v2.STARTING_STACK) for name, player in zip(lineup, table.players)]
+    return seed, hands, seats, table.stats.snapshot()
+
+
+def get_session_seeds(seed, num_sessions):
+    """Independent per session seeds, the same however many processes run them."""
+    return utils.spawn_seeds(seed, num_sessions)
+
+
+class Results:
+    """Per player type bb/100 samples, one per session (the mean over its seats), and pooled action stats."""
+
+    def __init__(self, big_blind=poker_v2.STARTING_BB):
+        self.big_blind = big_blind
+        self.samples = {}
+        self.stats = {}
+        self.hands = 0
+        self.sessions = 0
+
+    def add(self, hands, seats, snapshots):
+        self.sessions += 1
+        self.hands += hands
+        nets = {}
+        for (name, net), snapshot in zip(seats, snapshots):
+            nets.setdefault(name, []).append(net)
+            self.stats.setdefault(name, stats.PlayerStats()).merge(snapshot)
+        for name, net in nets.items():
+            self.samples.setdefault(name, []).append(np.mean(net) / self.big_blind / max(hands, 1) * 100)
+
+    def get_summary(self):
+        """{player type: (mean bb/100, CI half width, samples)}"""
+        summary = {}
+        for name, samples in self.samples.items():
+            samples = np.array(samples)
+            half_width = CI_Z * samples.std(ddof=1) / np.sqrt(len(samples)) if len(samples) > 1 else float('inf')
+            summary[name] = (float(samples.mean()), float(half_width), len(samples))
+        return summary
+
+
+def run(pool, lineup, num_sessions, num_hands, seed):
+    """Yield play_session results as sessions finish, in completion order."""
+    jobs = [(lineup, s, num_hands) for s in get_session_seeds(seed, num_sessions)]
+    yield from pool.imap_unordered(play_session, jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run seeded bot sessions in parallel and compare bb/100 per player type.")
+    parser.add_argument('lineup', nargs='*', default=LINEUP, help="poker_v2 player classes, one per seat")
+    parser.add_argument('--sessions', type=int, default=NUM_SESSIONS)
+    parser.add_argument('--hands', type=int, default=HANDS_PER_SESSION, help="hands per session")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--out', default=None, help="write per session results as JSON lines here")
+    args = parser.parse_args()
+
+    for name in args.lineup:
+        assert issubclass(getattr(poker_v2, name, None) or object, poker_v2.Player), f"Unknown player type {name}"
+        try:  # fail here rather than in every worker, e.g. GTOPlayer without its preflop table
+            getattr(poker_v2, name)(0, poker_v2.STARTING_STACK)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+
+    results = Results()
+    out = open(args.out, 'w') if args.out else None
+    start = perf_counter()
+    with Pool(args.processes) as pool:
+        for seed, hands, seats, snapshots in tqdm(run(pool, args.lineup, args.sessions, args.hands, args.seed), total=args.sessions):
+            results.add(hands, seats, snapshots)
+            if out:
+                out.write(json.dumps({'seed': seed, 'hands': hands, 'seats': seats}) + '\n')
+    elapsed = perf_counter() - start
+    if out:
+        out.close()
+
+    print(f"{results.sessions} sessions, {results.hands} hands in {elapsed:.2f}s")
+    for name, (mean, half_width, n) in sorted(results.get_summary().items(), key=lambda x: -x[1][0]):
+        print(f"{name}: {mean:.2f} +- {half_width:.2f} bb/100 ({n} sessions)")
+        rates = results.stats[name].get_rates()
+        print("    " + ", ".join(f"{rate}: {val:.3f}" for rate, val in rates.items() if val is not None))
+
+
+if __name__ == '__main__':
+    main()
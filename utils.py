@@ -1,9 +1,12 @@
 import random
+import numpy as np
+# local imports
+import cards
 
 
 SUITS = ['h', 's', 'd', 'c']
 CARDS = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
-DECK = [c + s for c in CARDS for s in SUITS]
+DECK = list(cards.DECK)  # int card ids, see cards.py
 
 c_lookup = {
     '2': 2, '3': 3, '4': 4, '5': 5, '6': 6,
@@ -13,18 +16,65 @@ c_lookup = {
 
 
 def make_deck():
-    random.shuffle(DECK)
-    return DECK
+    """A freshly shuffled copy, DECK itself is never touched."""
+    deck = DECK.copy()
+    random.shuffle(deck)
+    return deck
+
+
+class Deck:
+    """
+    Deals from one preallocated list by advancing an index. Each deal is a
+    partial Fisher-Yates step (swap a random undealt card into place), so only
+    the cards actually dealt get shuffled and reset() is just index = 0: the
+    buffer stays a permutation of the deck and any order is a valid start.
+    """
+
+    def __init__(self, seed=None):
+        self.cards = DECK.copy()
+        self.rng = random.Random(seed)
+        self.index = 0
+
+    def reset(self):
+        self.index = 0
+
+    def deal(self, num_cards):
+        deck, rand, start = self.cards, self.rng.random, self.index
+        for i in range(start, start + num_cards):
+            j = i + int(rand() * (cards.NUM_CARDS - i))
+            deck[i], deck[j] = deck[j], deck[i]
+        self.index = start + num_cards
+        return deck[start:self.index]
+
+    def __len__(self):
+        return cards.NUM_CARDS - self.index
+
+
+def spawn_seeds(seed, num_streams):
+    """Independent integer seeds for num_streams generators from one seed (all None if seed is None)."""
+    if seed is None:
+        return [None] * num_streams
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(num_streams)]
+
+
+def deal_batch(rng, num_deals, num_cards):
+    """First num_cards of num_deals independently shuffled decks, as an array."""
+    return np.argsort(rng.random((num_deals, cards.NUM_CARDS)), axis=1)[:, :num_cards]
+
+
+def get_hole_ids(holes):
+    """(..., 2) array of hole cards -> cards.hole_index of each hand."""
+    hi, lo = holes.max(-1), holes.min(-1)
+    return hi * (hi - 1) // 2 + lo
 
 
 def get_combo_from_hand(hand):
     (card1, card2) = hand
-    name = f"{card1[0]}{card2[0]}"
+    if card1 < card2:
+        card1, card2 = card2, card1
+    name = f"{CARDS[cards.RANK[card1]]}{CARDS[cards.RANK[card2]]}"
 
-    if c_lookup[card1[0]] < c_lookup[card2[0]]:
-        name = f"{card2[0]}{card1[0]}"
-
-    if card1[-1] != card2[-1] and card1[0] != card2[0]:  # off suited
+    if cards.SUIT[card1] != cards.SUIT[card2] and cards.RANK[card1] != cards.RANK[card2]:  # off suited
         name += 'o'
 
     return name
@@ -33,32 +83,27 @@ def get_combo_from_hand(hand):
 def get_hand_dict_from_combos(combo_data):
     return_dict = {}
 
-    for (cards, val) in combo_data.items():
-        if len(cards) == 3 or cards[0] == cards[1]:
-            for suit1 in SUITS:
-                for suit2 in SUITS:
+    for (name, val) in combo_data.items():
+        rank1, rank2 = CARDS.index(name[0]), CARDS.index(name[1])
+        if len(name) == 3 or name[0] == name[1]:
+            for suit1 in range(4):
+                for suit2 in range(4):
                     if suit1 != suit2:
-                        return_dict[(cards[0] + suit1, cards[1] + suit2)] = val
+                        return_dict[(rank1 * 4 + suit1, rank2 * 4 + suit2)] = val
         else:
-            for suit in SUITS:
-                return_dict[(cards[0] + suit, cards[1] + suit)] = val
+            for suit in range(4):
+                return_dict[(rank1 * 4 + suit, rank2 * 4 + suit)] = val
 
     return return_dict
 
 
 def get_combos_from_hand_dict(hand_data):
     combos = {}
-    for (card1, card2) in hand_data.keys():
-        name = f"{card1[0]}{card2[0]}"
-        if combos.get(f"{card2[0]}{card1[0]}"):
-            name = f"{card2[0]}{card1[0]}"
-
-        if card1[-1] != card2[-1] and card1[0] != card2[0]:  # off suited
-            name += 'o'
+    for hand in hand_data.keys():
+        name = get_combo_from_hand(hand)
 
         if not combos.get(name):
             combos[name] = []
 
-        combos[name] += [hand_data[(card1, card2)]]
+        combos[name] += [hand_data[hand]]
     return combos
-